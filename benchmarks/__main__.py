@@ -0,0 +1,81 @@
+import argparse
+import json
+import logging
+import sys
+
+from benchmarks import scenarios
+
+
+"""
+    PYSAD Benchmarks
+
+    Times the schedule, update, and cancel actions end to end against
+    local stand-ins of the NED GWF and Skynet APIs. Run from the root of
+    the repository:
+
+        python -m benchmarks --sizes 1000 10000 100000
+"""
+
+
+COLUMNS = ['scenario', 'galaxies', 'status', 'seconds', 'requests', 'errors', 'throughput', 'p50_ms', 'p99_ms',
+           'peak_mib']
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Benchmarks pysad against local stand-ins of NED and Skynet.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='number of galaxies of each localization')
+    parser.add_argument('--latency-ms', type=float, default=50., help='latency of each stand-in request')
+    parser.add_argument('--jitter-ms', type=float, default=10., help='uniform variation of the latency')
+    parser.add_argument('--error-rate', type=float, default=0., help='fraction of Skynet requests that fail')
+    parser.add_argument('--tel-section', default='All', help='telescope section config name')
+    parser.add_argument('--exp-section', default='Default', help='exposure section config name')
+    parser.add_argument('--max-workers', type=int, default=8, help='max number of concurrent API requests')
+    parser.add_argument('--max-obs-per-tele', type=int, default=None, help='cap on number of obs per telescope')
+    parser.add_argument('--stream', action='store_true', help='schedule as a pipeline')
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced pass measuring peak memory')
+    parser.add_argument('--keep', action='store_true', help='keep the temporary working directory')
+    parser.add_argument('--json', metavar='PATH', help='also write the measurements to a JSON file')
+    parser.add_argument('--verbose', action='store_true', help='log the failed requests')
+
+    return parser.parse_args(argv)
+
+
+def report(results: list) -> str:
+    """ Formats the measurements as a table.
+
+    :param results: measurements returned by scenarios.run
+    :return: table
+    """
+    def fmt(value) -> str:
+        if value is None:
+            return '-'
+        return f'{value:.2f}' if isinstance(value, float) else str(value)
+
+    rows = [COLUMNS] + [[fmt(result[column]) for column in COLUMNS] for result in results]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(COLUMNS))]
+
+    return '\n'.join('  '.join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+
+    results = scenarios.run(args.sizes, args.latency_ms / 1000., args.jitter_ms / 1000., args.error_rate,
+                            args.tel_section, args.exp_section, args.max_workers, args.max_obs_per_tele,
+                            args.stream, not args.no_memory, args.keep)
+
+    print(report(results))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
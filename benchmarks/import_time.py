@@ -0,0 +1,87 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict
+
+
+"""
+    Import-time budget
+
+    Measures the cold import time of the pysad entry point and of each
+    action in a fresh interpreter, and checks it against a budget. Heavy
+    modules that an action does not need must not be imported at all.
+    Run from the root of the repository:
+
+        python -m benchmarks.import_time
+"""
+
+
+# Max median import time in milliseconds and modules that must not be imported
+BUDGETS = {
+    'pysad.__main__': (50., ('numpy', 'ephem', 'requests', 'multiprocessing')),
+    'pysad.actions.cancel': (300., ('numpy', 'ephem')),
+    'pysad.actions.update': (500., ('ephem',)),
+    'pysad.actions.schedule': (500., ('ephem',)),
+    'pysad.actions.watch': (500., ('ephem',)),
+}
+
+# Heavy modules whose presence is reported
+HEAVY = ('numpy', 'ephem', 'requests', 'multiprocessing', 'pandas')
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{'ms': (time.perf_counter() - start) * 1000., 'modules': sorted(sys.modules)}}))
+"""
+
+
+def measure(module: str, runs: int = 5) -> Dict:
+    """ Imports the module in a fresh interpreter several times.
+
+    :param module: module name
+    :param runs: number of fresh interpreters
+    :return: dictionary with the median import time in milliseconds and
+        the heavy modules that were imported
+    """
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', PROBE.format(module=module)], capture_output=True, text=True,
+                             check=True)
+        samples.append(json.loads(out.stdout))
+
+    return {
+        'ms': statistics.median(sample['ms'] for sample in samples),
+        'heavy': [name for name in HEAVY if name in samples[0]['modules']]
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.import_time',
+                                     description='Checks the cold import time of pysad against a budget.')
+    parser.add_argument('--runs', type=int, default=5, help='number of fresh interpreters per module')
+    parser.add_argument('--scale', type=float, default=1., help='multiplies every budget; e.g., for slow machines')
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module, (budget, forbidden) in BUDGETS.items():
+        result = measure(module, args.runs)
+
+        problems = []
+        if result['ms'] > budget * args.scale:
+            problems.append(f'over budget of {budget * args.scale:.0f} ms')
+        if imported := [name for name in forbidden if name in result['heavy']]:
+            problems.append(f'imports {", ".join(imported)}')
+
+        failed |= bool(problems)
+
+        print(f'{module:<24} {result["ms"]:7.1f} ms  heavy: {", ".join(result["heavy"]) or "-":<32} '
+              f'{"; ".join(problems) or "ok"}')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import io
+
+import numpy
+
+
+"""
+    Synthetic localizations
+
+    Generates NED GWF style galaxy lists for benchmarking. Galaxy
+    positions only depend on the seed, so localizations generated with
+    the same seed but a different center describe a revised localization
+    of the same galaxies.
+"""
+
+
+HEADER = ['objname', 'ra', 'dec', 'DistMpc', 'P_3D', 'P_LumW1', 'P_LumK']
+
+# Fraction of galaxies without a P_3D value, as in real galaxy lists
+MISSING_FRACTION = 0.01
+
+
+def generate(size: int, seed: int = 0, center: tuple = (180., 30.), sigma_degs: float = 10.) -> str:
+    """ Generates the CSV galaxy list of a localization.
+
+    :param size: number of galaxies
+    :param seed: random seed of the galaxy positions
+    :param center: ra and dec in degrees of the localization center
+    :param sigma_degs: width in degrees of the localization
+    :return: CSV content
+    """
+    rng = numpy.random.default_rng(seed)
+
+    ra = (center[0] + rng.normal(0., 2. * sigma_degs, size)) % 360.
+    dec = numpy.clip(center[1] + rng.normal(0., 2. * sigma_degs, size), -89.9, 89.9)
+    dist = rng.uniform(10., 200., size)
+    p_lum = rng.lognormal(-2., 1., size)
+
+    # The probabilities depend on the localization center, shifted to non-negative seed entropy
+    rng = numpy.random.default_rng(numpy.random.SeedSequence([seed, int((center[0] % 360.) * 1000),
+                                                             int((center[1] + 90.) * 1000)]))
+
+    sep = separation_degs(ra, dec, *center)
+    p_3d = numpy.exp(-0.5 * (sep / sigma_degs) ** 2) * rng.uniform(0.5, 1., size)
+    missing = rng.random(size) < MISSING_FRACTION
+
+    out = io.StringIO()
+    out.write(','.join(HEADER) + '\n')
+
+    for i in range(size):
+        out.write(f'PGC {seed}-{i},{ra[i]:.5f},{dec[i]:.5f},{dist[i]:.2f},'
+                  f'{"" if missing[i] else f"{p_3d[i]:.6g}"},{p_lum[i]:.6g},0.1\n')
+
+    return out.getvalue()
+
+
+def separation_degs(ra, dec, center_ra: float, center_dec: float):
+    """ Returns the angular separation of each point from the center.
+
+    :param ra: Right ascensions in degrees
+    :param dec: Declinations in degrees
+    :param center_ra: Right ascension in degrees of the center
+    :param center_dec: Declination in degrees of the center
+    :return: separations in degrees
+    """
+    ra, dec = numpy.radians(ra), numpy.radians(dec)
+    center_ra, center_dec = numpy.radians(center_ra), numpy.radians(center_dec)
+
+    cos = numpy.sin(dec) * numpy.sin(center_dec) + numpy.cos(dec) * numpy.cos(center_dec) * numpy.cos(ra - center_ra)
+
+    return numpy.degrees(numpy.arccos(numpy.clip(cos, -1., 1.)))
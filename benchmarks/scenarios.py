@@ -0,0 +1,217 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import numpy
+
+from pysad.actions import cancel, schedule, update
+from pysad.skynet import api
+from pysad.utils import download, galaxies
+
+from benchmarks import localization
+from benchmarks.servers import NedStandIn, SkynetStandIn
+
+
+"""
+    Benchmark scenarios
+
+    Times the schedule, update, and cancel actions end to end against the
+    local stand-in servers and reports the throughput, latency, and peak
+    memory of each.
+"""
+
+
+# Localization center in degrees of the first and revised galaxy lists
+CENTER = (180., 30.)
+REVISED_CENTER = (185., 27.)
+
+
+class Workspace:
+    def __init__(self, skynet_url: str, ned_url: str, keep: bool = False):
+        self.skynet_url = skynet_url
+        self.ned_url = ned_url
+        self.keep = keep
+
+        self.path = None
+        self.cwd = None
+
+        # NED URL of the galaxy lists restored on exit
+        self.base_url = None
+
+    def __enter__(self) -> 'Workspace':
+        """ Creates a temporary working directory with a copy of the
+        configs pointing the Skynet API and NED at the stand-in servers.
+
+        :return: the workspace
+        """
+        self.cwd = os.getcwd()
+        self.path = tempfile.mkdtemp(prefix='pysad-bench-')
+
+        shutil.copytree(os.path.join(self.cwd, 'pysad', 'config'), os.path.join(self.path, 'pysad', 'config'))
+
+        with open(os.path.join(self.path, 'pysad', 'config', 'api.ini'), 'w') as f:
+            f.write(f'[API]\nserver = {self.skynet_url}\nversion = 2.0\npool_maxsize = 64\ntoken = benchmark\n')
+
+        self.base_url, galaxies.BASE_URL = galaxies.BASE_URL, self.ned_url
+        os.chdir(self.path)
+
+        return self
+
+    def __exit__(self, *args) -> None:
+        os.chdir(self.cwd)
+        galaxies.BASE_URL = self.base_url
+
+        if not self.keep:
+            shutil.rmtree(self.path, ignore_errors=True)
+
+
+class Recorder:
+    def __init__(self):
+        # Seconds from sending each request until its response headers
+        self.latencies: List[float] = []
+        self._lock = threading.Lock()
+
+    def hook(self, response, *args, **kwargs) -> None:
+        """ Requests response hook recording the latency of the request.
+
+        :param response: requests.Response
+        """
+        with self._lock:
+            self.latencies.append(response.elapsed.total_seconds())
+
+    def reset(self) -> None:
+        """ Forgets the recorded latencies.
+        """
+        with self._lock:
+            self.latencies = []
+
+
+def measure(name: str, size: int, func: Callable, recorder: Recorder, servers: List,
+            trace: bool = False) -> Dict:
+    """ Runs the scenario and measures its duration, request latencies,
+    and peak traced memory.
+
+    :param name: scenario name
+    :param size: number of galaxies in the localization
+    :param func: scenario to run
+    :param recorder: recorder of the request latencies
+    :param servers: stand-in servers whose requests are counted
+    :param trace: whether to trace memory allocations
+    :return: dictionary of measurements
+    """
+    recorder.reset()
+    before = [server.stats() for server in servers]
+
+    if trace:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    status = func()
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    latencies = numpy.asarray(recorder.latencies) * 1000.
+    after = [server.stats() for server in servers]
+
+    requests = sum(a['requests'] - b['requests'] for a, b in zip(after, before))
+    errors = sum(a['errors'] - b['errors'] for a, b in zip(after, before))
+
+    return {
+        'scenario': name,
+        'galaxies': size,
+        'status': status,
+        'seconds': seconds,
+        'requests': requests,
+        'errors': errors,
+        'throughput': requests / seconds if seconds else 0.,
+        'p50_ms': float(numpy.percentile(latencies, 50)) if len(latencies) else None,
+        'p99_ms': float(numpy.percentile(latencies, 99)) if len(latencies) else None,
+        'peak_mib': None if peak is None else peak / 1024 ** 2
+    }
+
+
+def run(sizes: List[int], latency: float = 0.05, jitter: float = 0.01, error_rate: float = 0.,
+        tel_section: str = 'All', exp_section: str = 'Default', max_workers: int = 8,
+        max_obs_per_tele: int = None, stream: bool = False, memory: bool = True, keep: bool = False) -> List[Dict]:
+    """ Runs the schedule, update, and cancel scenarios for localizations
+    of each size.
+
+    :param sizes: number of galaxies of each localization
+    :param latency: seconds each stand-in request is delayed
+    :param jitter: seconds the latency is uniformly varied by
+    :param error_rate: fraction of Skynet requests that fail
+    :param tel_section: Telescope section config name
+    :param exp_section: Exposure section config name
+    :param max_workers: Max number of concurrent API requests
+    :param max_obs_per_tele: Cap on number of obs per telescope
+    :param stream: Whether to schedule as a pipeline
+    :param memory: Whether to measure the peak memory in a traced pass
+    :param keep: Whether to keep the temporary working directory
+    :return: measurements of each scenario
+    """
+    kwargs = {'obs_section': 'Default', 'exp_section': exp_section, 'tel_section': tel_section,
+              'max_workers': max_workers, 'stream': stream}
+
+    if max_obs_per_tele is not None:
+        kwargs['max_obs_per_tele'] = max_obs_per_tele
+
+    ned = NedStandIn(latency=latency, jitter=jitter).start()
+    skynet = SkynetStandIn(latency=latency, jitter=jitter, error_rate=error_rate).start()
+
+    recorder = Recorder()
+    results = []
+
+    try:
+        with Workspace(skynet.url, ned.url, keep):
+            api.get_client().session.hooks['response'].append(recorder.hook)
+            download.get_session().hooks['response'].append(recorder.hook)
+
+            for size in sizes:
+                timed = lifecycle(size, ned, skynet, recorder, kwargs, trace=False)
+
+                # Tracing memory slows the code down, so it is measured in a separate pass
+                if memory:
+                    for result, traced in zip(timed, lifecycle(size, ned, skynet, recorder, kwargs, trace=True)):
+                        result['peak_mib'] = traced['peak_mib']
+
+                results += timed
+    finally:
+        ned.stop()
+        skynet.stop()
+
+    return results
+
+
+def lifecycle(size: int, ned: NedStandIn, skynet: SkynetStandIn, recorder: Recorder, kwargs: Dict,
+              trace: bool = False) -> List[Dict]:
+    """ Schedules an event with a localization of the provided size,
+    updates it with a revised localization, and cancels it.
+
+    :param size: number of galaxies in the localization
+    :param ned: NED stand-in
+    :param skynet: Skynet stand-in
+    :param recorder: recorder of the request latencies
+    :param kwargs: keyword arguments of the actions other than the event
+    :param trace: whether to trace memory allocations
+    :return: measurements of the schedule, update, and cancel scenarios
+    """
+    kwargs = {**kwargs, 'event': f'BENCH{size}{"T" if trace else ""}'}
+    servers = [ned, skynet]
+
+    ned.publish(kwargs['event'], localization.generate(size, seed=size, center=CENTER))
+    results = [measure('schedule', size, lambda: schedule.execute(**kwargs), recorder, servers, trace)]
+
+    ned.publish(kwargs['event'], localization.generate(size, seed=size, center=REVISED_CENTER))
+    results.append(measure('update', size, lambda: update.execute(**kwargs), recorder, servers, trace))
+
+    results.append(measure('cancel', size, lambda: cancel.execute(**kwargs), recorder, servers, trace))
+
+    return results
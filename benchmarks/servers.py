@@ -0,0 +1,293 @@
+import hashlib
+import itertools
+import json
+import multiprocessing
+import random
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+from urllib.parse import parse_qs
+
+
+"""
+    Benchmark stand-in servers
+
+    Local HTTP servers standing in for the NED GWF galaxy list service
+    and the Skynet observation API. Each request is delayed by a
+    configurable latency and fails with a configurable error rate so
+    that pysad can be benchmarked end to end without the real services.
+
+    Each server runs in its own process so that it does not compete with
+    the benchmarked code for the GIL, and is controlled over HTTP through
+    the '/_stats' and '/_lists' endpoints.
+"""
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, latency: float = 0., jitter: float = 0., error_rate: float = 0., seed: int = 0):
+        super().__init__(('127.0.0.1', 0), handler)
+
+        # Seconds each request is delayed, uniformly varied by +/- jitter
+        self.latency = latency
+        self.jitter = jitter
+
+        # Fraction of requests answered with a server error
+        self.error_rate = error_rate
+
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def url(self) -> str:
+        """ Returns the base URL of the server.
+
+        :return: URL; e.g., 'http://127.0.0.1:8000'
+        """
+        return f'http://{self.server_address[0]}:{self.server_address[1]}'
+
+    def draw(self) -> Tuple[float, bool]:
+        """ Draws the delay and whether to fail the next request.
+
+        :return: tuple of seconds to delay and whether to fail
+        """
+        with self.lock:
+            self.requests += 1
+            delay = max(self.latency + self.random.uniform(-self.jitter, self.jitter), 0.)
+            fail = self.random.random() < self.error_rate
+            self.errors += fail
+
+        return delay, fail
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    # Headers and body are written separately; avoids delayed ACK stalls
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        """ Serves '/_stats' with the number of requests and errors.
+        """
+        if self.path == '/_stats':
+            with self.server.lock:
+                stats = {'requests': self.server.requests, 'errors': self.server.errors}
+
+            return self.send(200, json.dumps(stats).encode())
+
+        self.serve_get()
+
+    def serve_get(self) -> None:
+        self.send(404, b'Not found', 'text/plain')
+
+    def simulate(self) -> bool:
+        """ Delays the request and answers it with a server error if it
+        was drawn to fail.
+
+        :return: True if the request failed, False otherwise
+        """
+        delay, fail = self.server.draw()
+        time.sleep(delay)
+
+        if fail:
+            self.send(500, b'Simulated server error', 'text/plain')
+
+        return fail
+
+    def send(self, status: int, body: bytes = b'', content_type: str = 'application/json',
+             headers: Dict[str, str] = None) -> None:
+        """ Sends a complete response.
+
+        :param status: HTTP status code
+        :param body: response body
+        :param content_type: Content-Type header
+        :param headers: additional headers
+        """
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_form(self) -> Dict[str, str]:
+        """ Reads a form encoded request body.
+
+        :return: dictionary of form fields
+        """
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+        return {key: values[-1] for key, values in parse_qs(body).items()}
+
+
+class NedHandler(StandInHandler):
+    def do_PUT(self) -> None:
+        """ Serves '/_lists/<event>/<serial>' by publishing the galaxy
+        list in the request body.
+        """
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        parts = self.path.strip('/').split('/')
+
+        if len(parts) != 3 or parts[0] != '_lists':
+            return self.send(404, b'Not found', 'text/plain')
+
+        self.server.lists[tuple(parts[1:])] = body
+        self.send(200, b'{}')
+
+    def serve_get(self) -> None:
+        """ Serves '/csv/<event>/<serial>' with conditional requests.
+        """
+        if self.simulate():
+            return
+
+        parts = self.path.strip('/').split('/')
+
+        if len(parts) != 3 or parts[0] != 'csv' or (content := self.server.lists.get(tuple(parts[1:]))) is None:
+            return self.send(404, b'Not found', 'text/plain')
+
+        etag = f'"{hashlib.sha256(content).hexdigest()}"'
+
+        if self.headers.get('If-None-Match') == etag:
+            return self.send(304, headers={'ETag': etag})
+
+        self.send(200, content, 'text/csv', {'ETag': etag})
+
+
+class NedServer(StandInServer):
+    def __init__(self, **kwargs):
+        super().__init__(NedHandler, **kwargs)
+
+        # CSV content of each (event, serial) galaxy list
+        self.lists: Dict[Tuple[str, str], bytes] = {}
+
+
+class SkynetHandler(StandInHandler):
+    def do_POST(self) -> None:
+        """ Serves '/<version>/obs' by creating an observation.
+        """
+        form = self.read_form()
+
+        if self.simulate():
+            return
+
+        if not self.path.rstrip('/').endswith('/obs'):
+            return self.send(404, b'Not found', 'text/plain')
+
+        with self.server.lock:
+            obs = {'id': next(self.server.ids), 'name': form.get('name'), 'state': 'active',
+                   'telescopes': form.get('telescopes')}
+            self.server.observations[obs['id']] = obs
+
+        self.send(200, json.dumps(obs).encode())
+
+    def do_PUT(self) -> None:
+        """ Serves '/<version>/obs/<id>' by updating an observation.
+        """
+        form = self.read_form()
+
+        if self.simulate():
+            return
+
+        try:
+            obs_id = int(self.path.rstrip('/').rsplit('/', 1)[1])
+        except ValueError:
+            return self.send(404, b'Not found', 'text/plain')
+
+        with self.server.lock:
+            if (obs := self.server.observations.get(obs_id)) is None:
+                return self.send(404, b'Observation not found', 'text/plain')
+
+            obs.update(form)
+
+        self.send(200, json.dumps(obs).encode())
+
+
+class SkynetServer(StandInServer):
+    def __init__(self, **kwargs):
+        super().__init__(SkynetHandler, **kwargs)
+
+        self.ids = itertools.count(1)
+        self.observations: Dict[int, Dict] = {}
+
+
+def serve(server_class, kwargs: Dict, urls) -> None:
+    """ Creates the server and serves requests until terminated. Runs in
+    the stand-in process.
+
+    :param server_class: StandInServer subclass
+    :param kwargs: keyword arguments of the server
+    :param urls: queue receiving the URL of the server once it listens
+    """
+    server = server_class(**kwargs)
+    urls.put(server.url)
+    server.serve_forever()
+
+
+class StandIn:
+    def __init__(self, server_class, **kwargs):
+        self._urls = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=serve, args=(server_class, kwargs, self._urls), daemon=True)
+        self.url = None
+
+    def start(self) -> 'StandIn':
+        """ Starts the server process and waits until it listens.
+
+        :return: the stand-in
+        """
+        self.process.start()
+        self.url = self._urls.get(timeout=30)
+
+        return self
+
+    def stop(self) -> None:
+        """ Terminates the server process.
+        """
+        self.process.terminate()
+        self.process.join()
+
+    def control(self, method: str, path: str, body: bytes = None) -> Dict:
+        """ Sends a request to a control endpoint of the server.
+
+        :param method: HTTP method
+        :param path: control endpoint; e.g., '/_stats'
+        :param body: request body
+        :return: deserialized response
+        """
+        with urllib.request.urlopen(urllib.request.Request(f'{self.url}{path}', body, method=method)) as r:
+            return json.loads(r.read())
+
+    def stats(self) -> Dict[str, int]:
+        """ Returns the number of requests served and failed on purpose.
+
+        :return: dictionary with requests and errors
+        """
+        return self.control('GET', '/_stats')
+
+
+class NedStandIn(StandIn):
+    def __init__(self, **kwargs):
+        super().__init__(NedServer, **kwargs)
+
+    def publish(self, event: str, content: str, serial: str = 'latest') -> None:
+        """ Publishes a galaxy list of the event.
+
+        :param event: event name
+        :param content: CSV content
+        :param serial: serial number of the galaxy list
+        """
+        self.control('PUT', f'/_lists/{event}/{serial}', content.encode())
+
+
+class SkynetStandIn(StandIn):
+    def __init__(self, **kwargs):
+        super().__init__(SkynetServer, **kwargs)
@@ -1,5 +1,11 @@
+import argparse
+import logging
+import os
 import sys
 from importlib import import_module
+from typing import Dict, List, Tuple
+
+from pysad.utils import metrics
 
 
 """
@@ -19,11 +25,12 @@ from importlib import import_module
 # DONE: Allow for custom config settings: E.g., DynamicMoon
 # DONE: pip freeze > requirements.txt
 # DONE: Implement cancelling observations
+# DONE: Replace pandas with builtin csv module to reduce ~100Mb
+# DONE: Group galaxies by proximity to reduce slewing time
+# DONE: Implement dynamic observation limit per telescope based on exp length
+# DONE: Replace the params dictionary with a command line interface
 
 # TODO: Allow union of telescopes. E.g., Northern | NonDLT100
-# TODO: Group galaxies by proximity to reduce slewing time
-# TODO: Implement dynamic observation limit per telescope based on exp length
-# TODO: Replace pandas with builtin csv module to reduce ~100Mb. Gets rid of numpy as well
 # TODO: If log file exists, only add new observations
 
 
@@ -33,37 +40,182 @@ def execute(**kwargs) -> int:
 
     :param kwargs: Accepted keyword arguments include:
         :Required:
-            - event (str): event name
-            - action (str): one of schedule, update, or cancel
+            - event (str): event name; not used by prepare
+            - action (str): one of prepare, schedule, update, cancel, or
+                watch
             - obs_section (str): observation section config name
             - exp_section (str): exposure section config name
             - tel_section {str}: telescope section config name
         :Optional:
-            - max_obs_per_tele (int): max num of obs per telescope
+            - max_obs_per_tele (int): cap on num of obs per telescope
+            - max_workers (int): max num of concurrent API requests
+            - profile (str): scoring section config name
+            - stream (bool): schedule as a pipeline to minimize the time
+                to the first observation
+            - poll_seconds (float): seconds between each poll of the
+                watch action
+            - metrics (str): path to write the timing spans and counters
+                of the run to; '.prom' files are written in the Prometheus
+                text format, others as JSON. May contain {event} and
+                {action} placeholders. A failure to write the metrics is
+                logged and does not change the exit status code
 
     :return: exit status code
     """
-    return import_module(f'pysad.actions.{kwargs.pop("action")}').execute(**kwargs)
+    action, path = kwargs.pop('action'), kwargs.pop('metrics', None)
+
+    if path:
+        metrics.enable()
+
+    try:
+        with metrics.span(f'action_{action}'):
+            return import_module(f'pysad.actions.{action}').execute(**kwargs)
+    finally:
+        if path:
+            path = path.format(event=kwargs.get('event'), action=action)
+
+            try:
+                metrics.dump(path)
+            except OSError as e:
+                logging.error(f'Failed to write the metrics to {path}: {e}')
+
+            metrics.disable()
+
+
+def execute_many(jobs: List[Dict], max_processes: int = None) -> List[int]:
+    """ Executes several jobs in parallel across a pool of processes. The
+    jobs of an event are executed in order by the same process so that
+    the results of each event are only ever written by one process. A
+    job that fails does not affect the others. A summary of the jobs is
+    logged once they are all complete.
+
+    :param jobs: keyword arguments of execute for each job
+    :param max_processes: max number of processes; defaults to the
+        number of CPUs
+    :return: exit status code of each job
+    """
+    events: Dict[str, List[Tuple[int, Dict]]] = {}
+    for index, job in enumerate(jobs):
+        events.setdefault(job['event'], []).append((index, job))
+
+    statuses, errors = [1] * len(jobs), [None] * len(jobs)
+
+    if events:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=min(max_processes or os.cpu_count() or 1, len(events))) as executor:
+            for outcomes in executor.map(execute_in_order, events.values()):
+                for index, status, error in outcomes:
+                    statuses[index], errors[index] = status, error
+
+    for job, status, error in zip(jobs, statuses, errors):
+        logging.info(f'{job["event"]} {job["action"]}: {"ok" if status == 0 else "failed"} '
+                     f'(status {status}){f": {error}" if error else ""}')
+
+    logging.info(f'{statuses.count(0)} of {len(jobs)} jobs succeeded.')
+
+    return statuses
+
+
+def execute_in_order(jobs: List[Tuple[int, Dict]]) -> List[Tuple[int, int, str | None]]:
+    """ Executes the jobs one after the other. Runs in a worker process.
+
+    :param jobs: index and keyword arguments of execute for each job
+    :return: index, exit status code, and error message of each job
+    """
+    outcomes = []
+    for index, job in jobs:
+        try:
+            outcomes.append((index, execute(**job), None))
+        except Exception as e:
+            logging.exception(e, exc_info=e)
+            outcomes.append((index, 1, f'{type(e).__name__}: {e}'))
+
+    return outcomes
 
 
-def main(p: dict) -> int:
+def main(p: dict | List[dict]) -> int:
+    if isinstance(p, list):
+        return max(execute_many(p), default=0)
+
     return execute(**p)
 
 
-if __name__ == '__main__':
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    """ Parses the command line arguments.
 
-    params = {
+    :param argv: command line arguments; defaults to sys.argv
+    :return: parsed arguments
+    """
+    parser = argparse.ArgumentParser(prog='python -m pysad',
+                                     description='Targeted search and discovery of gravitational-wave events '
+                                                 'with the Skynet Robotic Telescope Network.')
+
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument('--metrics', help="path to write metrics to; e.g., 'pysad/results/{event}/metrics.prom'")
+    output.add_argument('-v', '--verbose', action='store_true', help='log progress')
+
+    common = argparse.ArgumentParser(add_help=False, parents=[output])
+    common.add_argument('events', nargs='+', metavar='event', help='GW event name; e.g., S240414ed')
+    common.add_argument('--max-workers', type=int, default=8, help='max number of concurrent API requests')
+    common.add_argument('--processes', type=int, help='max number of events executed in parallel')
+
+    sections = argparse.ArgumentParser(add_help=False)
+    sections.add_argument('--obs-section', default='Default', help='observation configuration section')
+    sections.add_argument('--exp-section', default='Default', help='exposure configuration section')
+    sections.add_argument('--tel-section', default='Default', help='telescopes configuration section')
+
+    limits = argparse.ArgumentParser(add_help=False, parents=[sections])
+    limits.add_argument('--max-obs-per-tele', type=int, help='cap on the number of galaxies per telescope')
+    limits.add_argument('--profile', help='galaxy scoring configuration section; ranks by probability if not set')
+
+    actions = parser.add_subparsers(dest='action', required=True, metavar='action')
+    actions.add_parser('prepare', parents=[output, sections], help='prepare the event-independent work ahead of alerts')
+    schedule = actions.add_parser('schedule', parents=[common, limits], help='schedule observations of a new event')
+    schedule.add_argument('--stream', action='store_true', help='submit each request as soon as it is created')
+    actions.add_parser('update', parents=[common, limits], help='update the observations of an event')
+    actions.add_parser('cancel', parents=[common], help='cancel the observations of an event')
 
-        # Required
-        'event': 'GW170817',       # GW event name; e.g., s240414ed
-        'action': 'schedule',      # One of schedule, update, or cancel
-        'obs_section': 'Default',  # Observation configuration section
-        'exp_section': 'Default',  # Exposure configuration section
-        'tel_section': 'Default',  # Telescopes configuration section
+    watch = actions.add_parser('watch', parents=[common, limits], help='update an event as its localization changes')
+    watch.add_argument('--poll-seconds', type=float, default=60., help='seconds between each poll')
+    watch.add_argument('--stream', action='store_true', help='submit each request as soon as it is created')
 
-        # Optional
-        'max_obs_per_tele': 1      # Max number of galaxies per telescope
+    args = parser.parse_args(argv)
 
-    }
+    # Events executed in parallel would overwrite each other's metrics
+    if args.metrics and len(set(getattr(args, 'events', None) or ())) > 1 and '{event}' not in args.metrics:
+        parser.error('--metrics must contain the {event} placeholder when several events are given')
 
-    sys.exit(main(params))
+    return args
+
+
+def cli(argv: List[str] = None) -> int:
+    """ Executes the action of the command line on each event. Several
+    events are executed in parallel. The prepare action does not take
+    events.
+
+    :param argv: command line arguments; defaults to sys.argv
+    :return: exit status code
+    """
+    args = vars(parse_args(argv))
+
+    logging.basicConfig(level=logging.INFO if args.pop('verbose') else logging.WARNING)
+
+    events, processes = args.pop('events', None), args.pop('processes', None)
+
+    # Unset options are left to the defaults of the action
+    params = {key: value for key, value in args.items() if value is not None and value is not False}
+
+    if events is None:
+        return main(params)
+
+    jobs = [{**params, 'event': event} for event in events]
+
+    if len(jobs) == 1:
+        return main(jobs[0])
+
+    return max(execute_many(jobs, processes))
+
+
+if __name__ == '__main__':
+    sys.exit(cli())
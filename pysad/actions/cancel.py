@@ -1,26 +1,125 @@
-import json
 import logging
+import threading
+import time
+from typing import Callable
+
+from requests import RequestException
 
 from pysad.skynet import api
+from pysad.utils import concurrency
+from pysad.utils.results import ResultsStore
+
+
+# Number of canceled observations between each progress report
+PROGRESS_EVERY = 25
 
 
 def execute(**kwargs) -> int:
     """ Cancels Skynet observations for the provided event by sending
-    an update request via the Skynet API.
+    an update request via the Skynet API. The state of each observation
+    is recorded as soon as it is canceled, so observations canceled by a
+    previous run are skipped.
 
     :param kwargs: Accepted keyword arguments include:
         :Required:
             - event (str): event name
+        :Optional:
+            - max_workers (int): max num of concurrent API requests
 
     :return: status code
     """
-    with open(f'pysad/results/{kwargs["event"]}/results.json', 'r') as f:
-        results = json.load(f)
+    store = ResultsStore(kwargs['event'])
+
+    # Other processes may change the results of the event meanwhile
+    with store.locked():
+        if not store.exists():
+            raise RuntimeError(f'The results log for the event {kwargs["event"]} does not exist.')
+
+        obs_ids = [obs['id'] for obs in store.index.observations if obs.get('state') != 'canceled']
+
+        progress = Progress(len(obs_ids))
+
+        def record(obs_id, _) -> None:
+            store.set_state(obs_id, 'canceled')
+            progress.advance()
 
-    for obs in results['observations']:
         try:
-            api.update_observation(**{'id': obs['id'], 'state': 'canceled'})
-        except RuntimeError as e:
-            logging.exception(e)
+            canceled = cancel_observations(obs_ids, kwargs.get('max_workers', concurrency.DEFAULT_MAX_WORKERS), record)
+        finally:
+            store.checkpoint()
+
+        logging.info(f'Canceled {len(canceled)} of {len(obs_ids)} observations of {kwargs["event"]} '
+                     f'in {progress.elapsed():.1f} s ({progress.rate():.1f} obs/s).')
+
+        return 0 if len(canceled) == len(obs_ids) else 1
+
+
+def cancel_observations(obs_ids: list, max_workers: int = concurrency.DEFAULT_MAX_WORKERS,
+                        callback: Callable = None) -> list:
+    """ Cancels each observation using at most max_workers concurrent
+    requests. A failed cancellation is logged and does not affect the
+    others.
+
+    :param obs_ids: Observation IDs to cancel
+    :param max_workers: Max number of concurrent API requests
+    :param callback: function called with the observation ID and the
+        Skynet response as soon as the observation is canceled
+    :return: list of successfully canceled observation IDs
+    """
+    outcomes = concurrency.map_isolated(cancel_observation, obs_ids, max_workers, callback=callback)
+
+    canceled = []
+    for obs_id, (_, error) in zip(obs_ids, outcomes):
+        if error is not None:
+            logging.exception(error, exc_info=error)
+        else:
+            canceled.append(obs_id)
 
-    return 0
+    return canceled
+
+
+class Progress:
+    def __init__(self, total: int, every: int = PROGRESS_EVERY):
+        self.total = total
+        self.every = every
+        self.done = 0
+        self.start = time.monotonic()
+
+        self._lock = threading.Lock()
+
+    def advance(self) -> None:
+        """ Counts a completed item and logs the progress every so many
+        items. Safe to call from multiple threads.
+        """
+        with self._lock:
+            self.done += 1
+
+            if self.done % self.every == 0:
+                logging.info(f'Canceled {self.done}/{self.total} observations ({self.rate():.1f} obs/s).')
+
+    def elapsed(self) -> float:
+        """ Returns the seconds since the start.
+
+        :return: elapsed seconds
+        """
+        return time.monotonic() - self.start
+
+    def rate(self) -> float:
+        """ Returns the number of completed items per second.
+
+        :return: items per second
+        """
+        return self.done / max(self.elapsed(), 1e-9)
+
+
+def cancel_observation(obs_id: int | str) -> dict:
+    """ Cancels a single observation via the Skynet API. Throws a
+    RuntimeError if the request is unsuccessful or fails to connect.
+
+    :param obs_id: Observation ID
+    :return: Dictionary matching Skynet ObservationSchema
+    """
+    try:
+        return api.update_observation(id=obs_id, state='canceled')
+    except RequestException as e:
+        raise RuntimeError(f'Failed to cancel observation {obs_id}: {e}') from e
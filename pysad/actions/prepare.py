@@ -0,0 +1,32 @@
+import logging
+
+from pysad.actions import schedule
+from pysad.utils import prepared
+
+
+def execute(**kwargs) -> int:
+    """ Prepares for an alert by creating the plan of the provided
+    sections ahead of time. The plan holds the work of scheduling that
+    does not depend on the event and is saved to 'pysad/cache/plans/'.
+    Schedule uses the plan for the rest of the UTC day or until the
+    config files change. The moon of the plan is only used for
+    custom.MOON_MAX_AGE seconds, so prepare is best run hourly; e.g., by
+    cron.
+
+    :param kwargs: Accepted keyword arguments include:
+        :Required:
+            - obs_section (str): observation section config name
+            - exp_section (str): exposure section config name
+            - tel_section {str}: telescope section config name
+
+    :return: status code
+    """
+    telescopes = schedule.get_telescopes(kwargs['tel_section'])
+
+    plan = prepared.create(telescopes, kwargs['tel_section'], kwargs['obs_section'], kwargs['exp_section'])
+    path = prepared.save(plan)
+
+    logging.info(f'Prepared {len(plan["templates"])} request templates for {len(telescopes)} telescopes '
+                 f'in {path}.')
+
+    return 0
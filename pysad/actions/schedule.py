@@ -1,11 +1,18 @@
 import json
 import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
+
+from requests import RequestException
 
 from pysad.skynet import api
 from pysad.skynet.observation import Observation
 from pysad.utils.galaxies import GalaxyDB
-from pysad.utils import config
+from pysad.utils.results import ResultsStore
+from pysad.utils import assignment, capacity, concurrency, config, prepared, visibility
 
 
 def execute(**kwargs) -> int:
@@ -19,28 +26,107 @@ def execute(**kwargs) -> int:
             - exp_section (str): observation section config name
             - tel_section {str}: telescope section config name
         :Optional:
-            - max_obs_per_tele (int): max num of obs per telescope
+            - max_obs_per_tele (int): cap on num of obs per telescope
+            - max_workers (int): max num of concurrent API requests
+            - stream (bool): submit each request as soon as it is created
+            - profile (str): scoring section config name
+            - store (ResultsStore): results of the event kept in memory
+            - galaxy_db (GalaxyDB): galaxy list of the event
+
+    :return: status code; 1 if any request failed, in which case update
+        refills the queues
+    """
+    store = kwargs.pop('store', None) or ResultsStore(kwargs['event'])
+
+    # Other processes may change the results of the event meanwhile
+    with store.locked():
+        if is_scheduled(store):
+            raise RuntimeError(f'{kwargs["event"]} is already being managed. '
+                               f'Use the "update" action instead.')
+
+        if kwargs.get('stream'):
+            results = stream_obs_requests(store, **kwargs)
+            return log_results(store) or get_status(results)
+
+    kwargs = check_kwargs(**kwargs)
+
+    record_telescopes(store, kwargs['telescopes'])
+
+    # Resume an interrupted run without re-submitting its observations
+    obs_requests = create_obs_requests(**resume(store, **kwargs))
 
-    :return: status code
+    results = submit_obs_requests(obs_requests, kwargs.get('max_workers', concurrency.DEFAULT_MAX_WORKERS), store)
+
+    if kwargs.get('galaxy_db'):
+        record_serial(store, kwargs['galaxy_db'], len(kwargs['galaxies']))
+
+    return log_results(store) or get_status(results)
+
+
+def get_status(results: dict) -> int:
+    """ Returns the status code of the submitted observation requests.
+
+    :param results: Dictionary of submitted observations
+    :return: 0 if every request succeeded, 1 otherwise
     """
-    if not is_new_event(kwargs['event']):
-        raise RuntimeError(f'{kwargs["event"]} is already being managed. '
-                           f'Use the "update" action instead.')
+    return 1 if results['failed'] else 0
+
 
-    obs_requests = create_obs_requests(**kwargs)
-    results = submit_obs_requests(obs_requests)
+def is_scheduled(store: ResultsStore) -> bool:
+    """ Checks if a schedule run completed for the event. Results written
+    before runs were journaled are considered scheduled.
 
-    return log_results(kwargs['event'], results)
+    :param store: results of the event
+    :return: True if the event was scheduled, False otherwise
+    """
+    return store.meta.get('scheduled', os.path.exists(store.snapshot_path))
 
 
-def is_new_event(event: str) -> bool:
-    """ Checks if there is a results file for the provided event. If
-    there is no results file, the event is considered new.
+def resume(store: ResultsStore, **kwargs) -> dict:
+    """ Leaves out the galaxies already observed by an interrupted run
+    and the queue space their observations take up. Assignment depends
+    on the time and the capacity, so a resumed run could otherwise assign
+    an observed galaxy to another telescope and over-fill the queues.
 
-    :param event: event name
-    :return: True if event is new, False otherwise
+    :param store: results of the event
+    :param kwargs: keyword arguments populated by check_kwargs
+    :return: keyword arguments with the remaining galaxies and capacity
     """
-    return not os.path.exists(f'pysad/results/{event}/results.json')
+    if not store.index.by_id:
+        return kwargs
+
+    return {**kwargs, 'galaxies': [g for g in kwargs['galaxies'] if g['name'] not in store.index.by_name],
+            'capacity': capacity.queue_space(kwargs['telescopes'], kwargs['capacity'], store.index)}
+
+
+def record_telescopes(store: ResultsStore, telescopes: list[str]) -> None:
+    """ Records the telescopes of the event so that update can refill
+    their queues.
+
+    :param store: results of the event
+    :param telescopes: Telescope names
+    """
+    if store.meta.get('telescopes') != telescopes:
+        store.set_meta('telescopes', telescopes)
+
+
+def record_serial(store: ResultsStore, galaxy_db: GalaxyDB, limit: int, complete: bool = True) -> None:
+    """ Records the serial of the galaxy list the observations were last
+    reconciled with, so that the next update only reconciles the
+    galaxies that changed since.
+
+    :param store: results of the event
+    :param galaxy_db: galaxy list of the event
+    :param limit: number of top ranked galaxies the observations were
+        chosen from
+    :param complete: whether every observation of a galaxy that is no
+        longer desired was canceled
+    """
+    # Saves the ranked names of the serial for the next delta
+    galaxy_db.ranked_names()
+
+    store.set_meta('serial', {'number': galaxy_db.serial_number, 'revision': galaxy_db.revision,
+                              'profile': galaxy_db.profile, 'limit': limit, 'complete': complete})
 
 
 def create_obs_requests(**kwargs) -> list[dict]:
@@ -54,53 +140,153 @@ def create_obs_requests(**kwargs) -> list[dict]:
             - exp_section (str): observation section config name
             - tel_section {str}: telescope section config name
         :Optional:
-            - max_obs_per_tele (int): max num of obs per telescope
+            - max_obs_per_tele (int): cap on num of obs per telescope
+            - capacity (list): max num of obs for each telescope
             - galaxies (dict): name, ra, dec for each galaxy
 
     :return: list of dictionary observation requests
     """
     kwargs = check_kwargs(**kwargs)
 
-    obs_requests, index = [], 0
-    for telescope in kwargs['telescopes']:
-        for _ in range(kwargs['max_obs_per_tele']):
-            if index < len(kwargs['galaxies']):
-                obs = Observation(telescope=telescope,
-                                  galaxy=kwargs['galaxies'][index],
-                                  section=kwargs['obs_section'],
-                                  exp_section=kwargs['exp_section'])
-                obs_requests.append(obs.to_dict())
-                index += 1
-            else:
-                break  # Out of galaxies to observe
+    return Observation.build_many(kwargs['telescopes'], assign(**kwargs), kwargs['obs_section'], kwargs['exp_section'],
+                                  kwargs['templates'])
+
 
-    return obs_requests
+def assign(**kwargs) -> list[list[dict]]:
+    """ Assigns each telescope a compact cluster of the most probable
+    galaxies it can observe.
+
+    :param kwargs: keyword arguments populated by check_kwargs
+    :return: galaxies to observe for each telescope
+    """
+    galaxies = kwargs['galaxies']
+    hours = visibility.observable_hours([g['ra_hours'] for g in galaxies], [g['dec_degs'] for g in galaxies],
+                                        kwargs['telescopes'], kwargs['obs_section'])
 
+    return assignment.assign(kwargs['telescopes'], galaxies, kwargs['capacity'], hours)
 
-def submit_obs_requests(requests: list[dict]) -> dict:
-    """ Submits the observation requests to the Skynet API.
 
-    :param requests: List of observation requests
-    :return:
+def stream_obs_requests(store: ResultsStore, **kwargs) -> dict:
+    """ Creates and submits the observation requests as a pipeline to
+    minimize the time to the first observation. The galaxies are
+    downloaded and ranked while the telescope budgets are planned, and
+    each request is submitted as soon as it is created. Requests are
+    created in round-robin order across telescopes, starting with the
+    most probable galaxy of each.
+
+    :param store: Results store of the event
+    :param kwargs: Accepted keyword arguments of create_obs_requests
+    :return: Dictionary of submitted observations
     """
-    results = {'observations': []}
+    start = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        kwargs['galaxy_db'] = kwargs.get('galaxy_db') or GalaxyDB(kwargs['event'], profile=kwargs.get('profile'))
+
+        # Errors are raised again when the galaxies are needed
+        executor.submit(kwargs['galaxy_db'].columns)
 
-    for request in requests:
-        try:
-            obs = api.add_observation(exps=json.dumps(request.pop('exps')), **request)
-        except RuntimeError as e:
-            logging.exception(e)
+        kwargs = check_kwargs(**kwargs)
+
+    record_telescopes(store, kwargs['telescopes'])
+
+    # Resume an interrupted run without re-submitting its observations
+    groups = assign(**resume(store, **kwargs))
+    telescopes, groups = assignment.interleave(kwargs['telescopes'], groups)
+
+    requests = Observation.iter_many(telescopes, groups, kwargs['obs_section'], kwargs['exp_section'],
+                                     kwargs['templates'])
+
+    lock = threading.Lock()
+
+    def first(request: dict, _) -> None:
+        with lock:
+            if 'first_obs_seconds' in store.meta:
+                return
+
+            store.set_meta('first_obs_seconds', round(time.monotonic() - start, 3))
+
+        logging.info(f'Submitted the first observation of {kwargs["event"]} after '
+                     f'{store.meta["first_obs_seconds"]} s: {request["name"]} on {request["telescopes"]}.')
+
+    results = submit_obs_requests(requests, kwargs['max_workers'], store, stream=True, callback=first)
+
+    if kwargs.get('galaxy_db'):
+        record_serial(store, kwargs['galaxy_db'], len(kwargs['galaxies']))
+
+    return results
+
+
+def submit_obs_requests(requests: Iterable[dict], max_workers: int = concurrency.DEFAULT_MAX_WORKERS,
+                        store: ResultsStore = None, stream: bool = False, callback: Callable = None) -> dict:
+    """ Submits the observation requests to the Skynet API using at most
+    max_workers concurrent requests. A failed request is logged and does
+    not affect the others. Results are kept in the order of the requests.
+    If a results store is provided, each observation is recorded as soon
+    as it is created.
+
+    :param requests: Observation requests
+    :param max_workers: Max number of concurrent API requests
+    :param store: Results store of the event
+    :param stream: Whether to submit each request as soon as it is
+        produced by the requests iterator
+    :param callback: function called with the request and the Skynet
+        response as soon as the observation is created
+    :return: Dictionary of submitted observations and the number of
+        failed requests
+    """
+    results = {'observations': [], 'failed': 0}
+
+    def record(request: dict, obs: dict) -> None:
+        if store is not None:
+            store.add(to_result(request, obs))
+
+        if callback is not None:
+            callback(request, obs)
+
+    if stream:
+        outcomes = concurrency.stream_isolated(submit_obs_request, requests, max_workers, callback=record)
+    else:
+        requests = list(requests)
+        outcomes = [(request, *outcome) for request, outcome in
+                    zip(requests, concurrency.map_isolated(submit_obs_request, requests, max_workers, callback=record))]
+
+    for request, obs, error in outcomes:
+        if error is not None:
+            logging.exception(error, exc_info=error)
+            results['failed'] += 1
         else:
-            results['observations'].append({
-                'id': obs['id'],
-                'state': 'active',
-                'name': obs['name'],
-                'telescope': request['telescopes']}
-            )
+            results['observations'].append(to_result(request, obs))
 
     return results
 
 
+def to_result(request: dict, obs: dict) -> dict:
+    """ Returns the results entry of a submitted observation request.
+
+    :param request: Observation request
+    :param obs: Dictionary matching Skynet ObservationSchema
+    :return: Dictionary with id, state, name, and telescope
+    """
+    return {'id': obs['id'], 'state': 'active', 'name': obs['name'], 'telescope': request['telescopes']}
+
+
+def submit_obs_request(request: dict) -> dict:
+    """ Submits a single observation request to the Skynet API. Throws
+    a RuntimeError if the request is unsuccessful or fails to connect.
+
+    :param request: Observation request; exps may be pre-serialized
+    :return: Dictionary matching Skynet ObservationSchema
+    """
+    if not isinstance(exps := request['exps'], str):
+        exps = json.dumps(exps)
+
+    try:
+        return api.add_observation(**{**request, 'exps': exps})
+    except RequestException as e:
+        raise RuntimeError(f'Failed to submit the observation request: {e}') from e
+
+
 def get_telescopes(telescope_section: str) -> list[str | None] | str | None:
     """ Returns a list of all telescope names in the provided telescope
     config option.
@@ -108,44 +294,74 @@ def get_telescopes(telescope_section: str) -> list[str | None] | str | None:
     :param telescope_section: Telescope config option
     :return: List of telescope names
     """
-    settings = config.read('pysad/config/telescopes.ini')
+    settings = config.load('pysad/config/telescopes.ini')
 
-    telescopes = config.get(settings, telescope_section, 'telescopes')
-    telescopes = config.expected_type(telescopes)
+    telescopes = config.value(settings, telescope_section, 'telescopes')
 
-    return telescopes if isinstance(telescopes, list) else [telescopes]
+    return list(telescopes) if isinstance(telescopes, tuple) else [telescopes]
 
 
 def check_kwargs(**kwargs):
     """ Checks for optional keyword arguments and populates them if they
-    are not provided.
+    are not provided. The telescopes, budgets, and request templates are
+    taken from the plan created by the prepare action if it is current.
 
     :param kwargs: Accepted keyword arguments include:
-        - max_obs_per_tele (int): max num of obs per telescope
+        - plan (dict): plan of the prepare action
+        - max_obs_per_tele (int): cap on num of obs per telescope
+        - capacity (list): max num of obs for each telescope
         - galaxies (dict): name, ra, dec for each galaxy
+        - galaxy_db (GalaxyDB): galaxy list of the event
+        - profile (str): scoring section config name
+        - max_workers (int): max num of concurrent API requests
     :return: dictionary with optional params defined
     """
     if 'max_obs_per_tele' not in kwargs:
-        kwargs['max_obs_per_tele'] = 20
+        kwargs['max_obs_per_tele'] = None
+
+    if 'max_workers' not in kwargs:
+        kwargs['max_workers'] = concurrency.DEFAULT_MAX_WORKERS
+
+    # Event-independent work done ahead of time by the prepare action
+    if 'plan' not in kwargs:
+        kwargs['plan'] = prepared.load(kwargs['tel_section'], kwargs['obs_section'], kwargs['exp_section'])
+
+        if kwargs['plan'] is not None:
+            prepared.restore_moon(kwargs['plan'])
+
+    plan = kwargs['plan']
 
     if 'telescopes' not in kwargs:
-        kwargs['telescopes'] = get_telescopes(kwargs['tel_section'])
+        kwargs['telescopes'] = plan['telescopes'] if plan else get_telescopes(kwargs['tel_section'])
+
+    if 'templates' not in kwargs:
+        kwargs['templates'] = prepared.templates(plan, kwargs['obs_section']) if plan else None
+
+    # Each telescope observes as many galaxies as its dark time allows
+    if 'capacity' not in kwargs:
+        if plan and kwargs['telescopes'] == plan['telescopes']:
+            kwargs['capacity'] = prepared.budgets(plan, kwargs['max_obs_per_tele'])
+        else:
+            kwargs['capacity'] = capacity.budgets(kwargs['telescopes'], kwargs['obs_section'],
+                                                  kwargs['exp_section'], kwargs['max_obs_per_tele'])
 
     if 'galaxies' not in kwargs:
-        limit = len(kwargs['telescopes']) * kwargs['max_obs_per_tele']
-        kwargs['galaxies'] = GalaxyDB(kwargs['event']).get(limit=limit)
+        limit = sum(kwargs['capacity']) * assignment.CANDIDATE_FACTOR
+        kwargs['galaxy_db'] = kwargs.get('galaxy_db') or GalaxyDB(kwargs['event'], profile=kwargs.get('profile'))
+        kwargs['galaxies'] = kwargs['galaxy_db'].get(limit=limit)
 
     return kwargs
 
 
-def log_results(event: str, results: dict) -> int:
-    """ Writes the results dictionary to 'gwsad/results/<event>/results.json'.
+def log_results(store: ResultsStore) -> int:
+    """ Marks the event as scheduled and checkpoints the results stored
+    in 'pysad/results/<event>/'. Observations are journaled as they are
+    created.
 
-    :param event: Event name
-    :param results: Dictionary of results
+    :param store: Results store of the event
     :return: 0 for success
     """
-    with open(f'pysad/results/{event}/results.json', 'w') as f:
-        f.write(json.dumps(results, indent=4))
+    store.set_meta('scheduled', True)
+    store.checkpoint()
 
     return 0
@@ -1,9 +1,10 @@
-import json
+import logging
 
-from pysad.actions import schedule
-from pysad.skynet import api
+from pysad.actions import cancel, schedule
 from pysad.skynet.observation import Observation
-from pysad.utils.galaxies import GalaxyDB
+from pysad.utils import assignment, capacity, concurrency, scoring, visibility
+from pysad.utils.galaxies import Delta, GalaxyDB
+from pysad.utils.results import Plan, ResultsStore, reconcile, reconcile_delta
 
 
 def execute(**kwargs) -> int:
@@ -17,160 +18,216 @@ def execute(**kwargs) -> int:
             - exp_section (str): observation section config name
             - tel_section {str}: telescope section config name
         :Optional:
-            - max_obs_per_tele (int): max num of obs per telescope
+            - max_obs_per_tele (int): cap on num of obs per telescope
+            - max_workers (int): max num of concurrent API requests
+            - profile (str): scoring section config name
+            - store (ResultsStore): results of the event kept in memory
+            - galaxy_db (GalaxyDB): galaxy list of the event
 
     :return: status code
     """
-    if schedule.is_new_event(kwargs['event']):
-        raise RuntimeError(f'The results log for the event {kwargs["event"]}'
-                           f' does not exist. Use the "schedule" action instead.')
+    store = kwargs.pop('store', None) or ResultsStore(kwargs['event'])
 
-    with open(f'pysad/results/{kwargs["event"]}/results.json', 'r') as f:
-        prev_results = json.load(f)
+    # Other processes may change the results of the event meanwhile
+    with store.locked():
+        if not store.exists():
+            raise RuntimeError(f'The results log for the event {kwargs["event"]}'
+                               f' does not exist. Use the "schedule" action instead.')
 
-    galaxies = get_galaxy_list(prev_results, **kwargs)
+        kwargs['telescopes'] = get_event_telescopes(store)
 
-    # Cancel outdated observations
-    outdated = handle_outdated_observations(prev_results, galaxies)
+        # Each telescope observes as many galaxies as its dark time allows
+        kwargs['capacity'] = capacity.budgets(kwargs['telescopes'], kwargs['obs_section'], kwargs['exp_section'],
+                                              kwargs.get('max_obs_per_tele'))
 
-    # Schedule new observations
-    results = handle_new_observations(prev_results, galaxies, **kwargs, outdated=outdated)
+        kwargs['galaxy_db'] = kwargs.get('galaxy_db') or GalaxyDB(kwargs['event'], profile=kwargs.get('profile'))
+        galaxies = get_galaxy_list(**kwargs)
 
-    log_results(kwargs['event'], prev_results, results, outdated)
+        # Compute which observations to cancel and add
+        plan = get_plan(store, kwargs['galaxy_db'], galaxies)
 
-    return 0
+        # Cancel outdated observations
+        canceled = handle_outdated_observations(plan, kwargs.get('max_workers', concurrency.DEFAULT_MAX_WORKERS), store)
+
+        # Schedule new observations
+        handle_new_observations(plan, **kwargs, store=store)
+
+        # Later serials are only reconciled against the changes since this one
+        schedule.record_serial(store, kwargs['galaxy_db'], len(galaxies), len(canceled) == len(plan.cancel_ids()))
+
+        return log_results(store)
 
 
-def get_galaxy_list(results: dict, **kwargs) -> list:
+def get_galaxy_list(**kwargs) -> list:
+    """ Returns the most recent list of desired galaxies for the event.
+
+    :param kwargs: Accepted keyword arguments include:
+        :Required:
+            - capacity (list): max num of obs for each telescope
+        :Optional:
+            - galaxy_db (GalaxyDB): galaxy list of the event
+            - profile (str): scoring section config name
+    :return: list of galaxies in ranked order
     """
+    # Get the most recent list of galaxies for the event. Schedule assigns
+    # candidates past the capacity when galaxies are not observable
+    galaxy_db = kwargs.get('galaxy_db') or GalaxyDB(kwargs['event'], profile=kwargs.get('profile'))
 
-    :param results:
-    :param kwargs:
-    :return:
+    return galaxy_db.get(limit=sum(kwargs['capacity']) * assignment.CANDIDATE_FACTOR)
+
+
+def get_plan(store: ResultsStore, galaxy_db: GalaxyDB, galaxies: list) -> Plan:
+    """ Computes which observations to cancel and which galaxies to add.
+    If the observations were reconciled with an earlier serial ranked
+    the same way, only the galaxies that changed since that serial are
+    reconciled. Otherwise, every observation is. Profiles that call
+    registered callables are always fully reconciled since their ranking
+    can change while the serial stays the same.
+
+    :param store: results of the event
+    :param galaxy_db: galaxy list of the event
+    :param galaxies: desired galaxies in ranked order
+    :return: reconciliation plan
     """
-    if 'max_obs_per_tele' not in kwargs:
-        kwargs['max_obs_per_tele'] = 20
+    previous = store.meta.get('serial')
 
-    telescopes = get_event_telescopes(results)
+    if previous and previous['complete'] and previous['profile'] == galaxy_db.profile and is_delta_ranked(galaxy_db):
+        limit = max(len(galaxies), previous['limit'])
 
-    # Get the most recent list of galaxies for the event
-    return GalaxyDB(kwargs['event']).get(start=2, limit=len(telescopes) * kwargs['max_obs_per_tele'])
+        if (delta := galaxy_db.delta(previous['number'], limit)) is not None:
+            logging.info(f'Reconciling serial {galaxy_db.serial_number} of {galaxy_db.event} against serial '
+                         f'{previous["number"]}: {len(delta.entered)} entered, {len(delta.dropped)} dropped, '
+                         f'{len(delta.moved)} changed rank.')
 
+            left = get_left_galaxies(delta, galaxy_db.ranked_names()[:limit].tolist(), len(galaxies),
+                                     previous['limit'])
 
-def get_event_telescopes(results: dict) -> list[str]:
-    return list(set([obs['telescope'] for obs in results['observations']]))
+            return reconcile_delta(store.index, galaxies, left)
 
+    return reconcile(store.index, galaxies)
 
-# <editor-fold desc="outdated-obs">
-def handle_outdated_observations(results: dict[str, dict], galaxies: list[dict]) -> dict:
+
+def is_delta_ranked(galaxy_db: GalaxyDB) -> bool:
+    """ Checks if the ranking of the galaxy list only depends on its
+    serial, so that serials can be reconciled on their delta.
+
+    :param galaxy_db: galaxy list of the event
+    :return: True if the ranked names of a serial never change
     """
+    return galaxy_db.profile is None or scoring.get_profile(galaxy_db.profile).cacheable
+
+
+def get_left_galaxies(delta: Delta, names: list[str], limit: int, previous_limit: int) -> set[str]:
+    """ Returns the galaxies that were desired by the previous serial but
+    are not desired anymore.
 
-    :param results:
-    :param galaxies:
-    :return:
+    :param delta: changes between the top ranked galaxies of the serials
+    :param names: top ranked galaxy names of the current serial
+    :param limit: number of desired galaxies of the current serial
+    :param previous_limit: number of desired galaxies of the previous serial
+    :return: set of galaxy names
     """
-    outdated = get_outdated_observations(results, galaxies)
+    left = {name for name, rank in delta.dropped.items() if rank < previous_limit}
+    left.update(name for name, (old, new) in delta.moved.items() if old < previous_limit and new >= limit)
 
-    for _, value in outdated.items():
-        cancel_outdated_observations(value)
+    # Galaxies that kept their rank but are past a shorter list
+    left.update(names[limit:previous_limit])
 
-    return outdated
+    return left
 
 
-def get_outdated_observations(results: dict, galaxies: list[dict]):
-    """
+def get_event_telescopes(store: ResultsStore) -> list[str]:
+    """ Returns the telescopes the event was scheduled on. Results
+    written before the telescopes were recorded use the telescopes with
+    at least one observation.
 
-    :param results:
-    :param galaxies:
-    :return:
+    :param store: results of the event
+    :return: list of telescope names
     """
-    desired_galaxies = [g['name'] for g in galaxies]
+    return store.meta.get('telescopes') or store.index.telescopes()
 
-    outdated = {}
-    for obs in results['observations']:
-        if obs['name'] not in desired_galaxies:
-            if obs['telescope'] in outdated:
-                outdated[obs['telescope']].append(obs['id'])
-            else:
-                outdated[obs['telescope']] = [obs['id']]
 
-    return outdated
+# <editor-fold desc="outdated-obs">
+def handle_outdated_observations(plan: Plan, max_workers: int = concurrency.DEFAULT_MAX_WORKERS,
+                                 store: ResultsStore = None) -> list:
+    """ Cancels the observations of galaxies that are no longer desired.
+
+    :param plan: reconciliation plan
+    :param max_workers: Max number of concurrent API requests
+    :param store: Results store of the event
+    :return: list of successfully canceled observation IDs
+    """
+    return cancel_outdated_observations(plan.cancel_ids(), max_workers, store)
 
 
-def cancel_outdated_observations(obs_ids: list):
-    """
+def cancel_outdated_observations(obs_ids: list, max_workers: int = concurrency.DEFAULT_MAX_WORKERS,
+                                 store: ResultsStore = None) -> list:
+    """ Cancels the observations. If a results store is provided, each
+    observation is removed from the results as soon as it is canceled.
 
-    :param obs_ids:
-    :return:
+    :param obs_ids: Observation IDs to cancel
+    :param max_workers: Max number of concurrent API requests
+    :param store: Results store of the event
+    :return: list of successfully canceled observation IDs
     """
-    for obs_id in obs_ids:
-        api.update_observation(id=obs_id, state='canceled')
+    def record(obs_id, _) -> None:
+        store.remove(obs_id)
+
+    return cancel.cancel_observations(obs_ids, max_workers, record if store is not None else None)
 # </editor-fold>"
 
 
 # <editor-fold desc="new-obs">
-def handle_new_observations(results: dict, galaxies: list[dict], **kwargs) -> dict:
-    """
+def handle_new_observations(plan: Plan, **kwargs) -> dict:
+    """ Submits observations of the desired galaxies that are not
+    observed yet.
 
-    :param results:
-    :param galaxies:
-    :return:
+    :param plan: reconciliation plan
+    :param kwargs: Accepted keyword arguments include:
+        - store (ResultsStore): results store to record new observations
+    :return: dictionary of new results
     """
-    requests = get_new_observations(results, galaxies, **kwargs)
-    return schedule.submit_obs_requests(requests)
+    requests = get_new_observations(plan, **kwargs)
+    return schedule.submit_obs_requests(requests, kwargs.get('max_workers', concurrency.DEFAULT_MAX_WORKERS),
+                                        kwargs.get('store'))
 
 
-def get_new_observations(results: dict, galaxies: list[dict], **kwargs) -> list[dict]:
-    """
+def get_new_observations(plan: Plan, **kwargs) -> list[dict]:
+    """ Creates observation requests for the galaxies to add. Each
+    telescope receives as many galaxies as it has capacity left after
+    its outdated observations were canceled.
 
-    :param results:
-    :param galaxies:
-    :return:
+    :param plan: reconciliation plan
+    :param kwargs: Accepted keyword arguments include:
+        - telescopes (list): telescope names
+        - capacity (list): max num of obs for each telescope
+        - store (ResultsStore): results store of the event
+    :return: list of dictionary observation requests
     """
-    tele_queue_space = kwargs['outdated']
-
-    observed_galaxies = [obs['name'] for obs in results['observations']]
-    new_galaxies = [g for g in galaxies if g['name'] not in observed_galaxies]
-
-    obs_requests, index = [], 0
-    for tele in tele_queue_space:
-        for _ in range(len(tele_queue_space[tele])):
-            if index < len(new_galaxies):
-                obs = Observation(tele, new_galaxies[index], kwargs['obs_section'], kwargs['exp_section'])
-                obs_requests.append(obs.to_dict())
-                index += 1
-            else:
-                break  # Out of galaxies to observe
-
-    return obs_requests
-# </editor-fold>
+    telescopes = kwargs['telescopes']
+    tele_queue_space = capacity.queue_space(telescopes, kwargs['capacity'], kwargs['store'].index)
 
+    if not plan.add or not any(tele_queue_space):
+        return []
 
-def log_results(event: str, results: dict, added: dict, outdated: dict) -> int:
-    """ Writes the results dictionary to 'gwsad/results/<event>/results.json'.
+    # Freed queue space is filled with compact clusters of the most probable galaxies
+    # that each telescope can observe
+    hours = visibility.observable_hours([g['ra_hours'] for g in plan.add], [g['dec_degs'] for g in plan.add],
+                                        telescopes, kwargs['obs_section'])
 
-    :param event: event name
-    :param results: previous results
-    :param added: dictionary of new results
-    :param outdated: dict of canceled observations
-    :return: 0 for success
-    """
-    canceled_obs_ids = []
-    for _, obs_ids in outdated.items():
-        canceled_obs_ids.extend(obs_ids)
+    groups = assignment.assign(telescopes, plan.add, tele_queue_space, hours)
 
-    # Remove canceled observations
-    obs_to_remove = []
-    for obs in results['observations']:
-        if obs['id'] in canceled_obs_ids:
-            obs_to_remove.append(obs)
+    return Observation.build_many(telescopes, groups, kwargs['obs_section'], kwargs['exp_section'])
+# </editor-fold>
 
-    results['observations'] = [obs for obs in results['observations'] if obs not in obs_to_remove]
 
-    # Add new observations
-    results['observations'].extend(added['observations'])
+def log_results(store: ResultsStore) -> int:
+    """ Checkpoints the results stored in 'pysad/results/<event>/'.
+    Canceled and new observations are journaled as they happen.
 
-    with open(f'pysad/results/{event}/results.json', 'w') as f:
-        f.write(json.dumps(results, indent=4))
+    :param store: Results store of the event
+    :return: 0 for success
+    """
+    store.checkpoint()
 
     return 0
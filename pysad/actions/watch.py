@@ -0,0 +1,93 @@
+import logging
+import os
+import time
+
+from pysad.actions import schedule, update
+from pysad.utils.galaxies import GalaxyDB
+from pysad.utils.results import ResultsStore
+
+
+# Default number of seconds between each poll of the galaxy list
+POLL_SECONDS = 60.
+
+
+def execute(**kwargs) -> int:
+    """ Watches the galaxy list of the provided event and schedules or
+    updates its observations every time the localization changes. The
+    process stays resident so that the configs, HTTP sessions, and the
+    results of the event are kept in memory between revisions. Changes
+    made to the results by other runs, e.g., a manual cancel, are applied
+    before each revision is handled.
+
+    :param kwargs: Accepted keyword arguments include:
+        :Required:
+            - event (str): event name
+            - obs_section (str): observation section config name
+            - exp_section (str): observation section config name
+            - tel_section {str}: telescope section config name
+        :Optional:
+            - max_obs_per_tele (int): cap on num of obs per telescope
+            - max_workers (int): max num of concurrent API requests
+            - profile (str): scoring section config name
+            - poll_seconds (float): seconds between each poll
+            - max_polls (int): number of polls before returning; polls
+                until interrupted by default
+
+    :return: status code
+    """
+    store = ResultsStore(kwargs['event'])
+    poll_seconds = kwargs.pop('poll_seconds', POLL_SECONDS)
+    max_polls = kwargs.pop('max_polls', None)
+
+    polls = 0
+    try:
+        while max_polls is None or polls < max_polls:
+            started = time.monotonic()
+
+            try:
+                poll(store, **kwargs)
+            except Exception as e:
+                # The next poll tries again
+                logging.exception(e, exc_info=e)
+
+            if (polls := polls + 1) != max_polls:
+                time.sleep(max(poll_seconds - (time.monotonic() - started), 0.))
+    except KeyboardInterrupt:
+        logging.info(f'Stopped watching {kwargs["event"]}.')
+    finally:
+        with store.locked():
+            store.checkpoint()
+
+    return 0
+
+
+def poll(store: ResultsStore, **kwargs) -> bool:
+    """ Checks if the galaxy list of the event changed since the
+    observations were last reconciled with it, by watch or any other run,
+    and, if so, schedules the event or updates its observations. An
+    unchanged galaxy list only costs a conditional request.
+
+    :param store: results of the event
+    :param kwargs: Accepted keyword arguments of schedule and update
+    :return: True if the galaxy list changed, False otherwise
+    """
+    galaxy_db = GalaxyDB(kwargs['event'], profile=kwargs.get('profile'))
+
+    # Cached content is addressed by its digest, so the path identifies the revision
+    path = galaxy_db.query(galaxy_db.serial)
+    revision = os.path.basename(path)
+
+    with store.locked():
+        if (store.meta.get('serial') or {}).get('revision') == revision:
+            return False
+
+    logging.info(f'The galaxy list of {kwargs["event"]} changed: {revision}.')
+
+    galaxy_db.save_to_disk(path)
+
+    if schedule.is_scheduled(store):
+        update.execute(**kwargs, store=store, galaxy_db=galaxy_db)
+    else:
+        schedule.execute(**kwargs, store=store, galaxy_db=galaxy_db)
+
+    return True
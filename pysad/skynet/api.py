@@ -1,12 +1,20 @@
+import threading
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from pysad.skynet import capabilities
+from pysad.utils import config, metrics
 
-from pysad.utils import config
+
+_client = None
+_client_lock = threading.Lock()
 
 
 def get_base_url(settings) -> str:
     """ Returns the base URL for a Skynet API request.
 
-    :param settings: configparser.ConfigParser
+    :param settings: API config snapshot
     :return: Server URL with API version
     """
     return f'{get_api_server(settings)}/{get_api_version(settings)}'
@@ -15,28 +23,28 @@ def get_base_url(settings) -> str:
 def get_api_server(settings):
     """ Returns the base URL for a Skynet API request.
 
-    :param settings: configparser.ConfigParser
+    :param settings: API config snapshot
     :return: Server URL
     """
-    return settings.get('API', 'server')
+    return config.value(settings, 'API', 'server')
 
 
 def get_api_key(settings) -> str:
     """ Returns the API key for a Skynet API request.
 
-    :param settings: configparser.ConfigParser
+    :param settings: API config snapshot
     :return: API key
     """
-    return settings.get('API', 'token')
+    return config.value(settings, 'API', 'token')
 
 
 def get_api_version(settings) -> str:
     """ Returns the API version for a Skynet API request.
 
-    :param settings: configparser.ConfigParser
+    :param settings: API config snapshot
     :return: API version
     """
-    return settings.get('API', 'version')
+    return config.value(settings, 'API', 'version')
 
 
 def handle_server_response(r: requests.models.Response):
@@ -67,32 +75,150 @@ def handle_server_response(r: requests.models.Response):
         return filename[filename.index('"') + 1:filename.rindex('"')].strip(), r.content
 
 
-def add_observation(**kwargs):
-    """ Submits a request to the Skynet API to add an observation.
-    If the request is unsuccessful due to a missing rprime filter,
-    reattempts with the R filter. Throws a RuntimeError if the
-    request is still unsuccessful.
+def get_pool_maxsize(settings) -> int:
+    """ Returns the maximum number of kept-alive connections to the
+    Skynet API. Defaults to 16 if not configured.
 
-    :param kwargs: Dictionary of request parameters
-    :return: Dictionary matching Skynet ObservationSchema
+    :param settings: API config snapshot
+    :return: Connection pool size
     """
-    settings = config.read('pysad/config/api.ini')
-    request = {'data': kwargs, 'headers': {'Authentication-Token': get_api_key(settings)}}
+    return int(config.value(settings, 'API', 'pool_maxsize') or 16)
 
-    r = requests.request('POST', f'{get_base_url(settings)}/obs', **request)
 
-    if r.status_code != 200:
-        if 'has no filter "rprime"' in r.text:
-            kwargs['exps'] = kwargs['exps'].replace('"rprime"', '"R"')
-            return add_observation(**kwargs)
-        else:
-            raise RuntimeError(r.text)
+def get_timeout(settings) -> float:
+    """ Returns the seconds to wait for the Skynet API to connect or
+    respond. Defaults to 30 if not configured.
+
+    :param settings: API config snapshot
+    :return: Request timeout in seconds
+    """
+    return float(config.value(settings, 'API', 'timeout') or 30)
+
+
+class SkynetClient:
+    def __init__(self, path: str = 'pysad/config/api.ini'):
+        settings = config.load(path, typed=False)
+
+        self.base_url = get_base_url(settings)
+        self.timeout = get_timeout(settings)
+
+        # Keep-alive session so requests reuse the TCP+TLS connections
+        self.session = requests.Session()
+        self.session.headers.update({'Authentication-Token': get_api_key(settings)})
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=get_pool_maxsize(settings))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method: str, endpoint: str, **kwargs) -> requests.models.Response:
+        """ Sends a request to the Skynet API over the pooled session.
+        Requests time out after the configured timeout unless another
+        timeout is provided.
+
+        :param method: HTTP method
+        :param endpoint: API endpoint relative to the base URL; e.g., 'obs'
+        :param kwargs: Keyword arguments passed to requests.Session.request
+        :return: requests.models.Response
+        """
+        with metrics.span(f'skynet_{method.lower()}'):
+            r = self.session.request(method, f'{self.base_url}/{endpoint}', **{'timeout': self.timeout, **kwargs})
+
+        metrics.increment('skynet_requests')
+
+        if r.status_code != 200:
+            metrics.increment('skynet_failures')
+
+        return r
+
+    def add_observation(self, **kwargs):
+        """ Submits a request to the Skynet API to add an observation.
+        Filters the telescope is known to not have are replaced by their
+        fallback before the request is sent. If the request is
+        unsuccessful due to a missing filter with a fallback, e.g.,
+        rprime, the rejection is learned and the request is reattempted
+        with the fallback filter, e.g., R. Throws a RuntimeError if the
+        request is still unsuccessful.
+
+        :param kwargs: Dictionary of request parameters
+        :return: Dictionary matching Skynet ObservationSchema
+        """
+        telescope = kwargs.get('telescopes')
+        kwargs['exps'] = capabilities.substitute(telescope, kwargs['exps'])
+
+        r = self.request('POST', 'obs', data=kwargs)
+
+        if r.status_code != 200:
+            if (rejection := capabilities.parse_rejection(r.text)) and f'"{rejection[0]}"' in kwargs['exps']:
+                metrics.increment('skynet_retries')
+                capabilities.learn(telescope, rejected=[rejection[0]])
+
+                obs = self.add_observation(**kwargs)
+                capabilities.learn(telescope, supported=[rejection[1]])
+
+                return obs
+            else:
+                raise RuntimeError(r.text)
 
-    return handle_server_response(r)
+        return handle_server_response(r)
+
+    def update_observation(self, **kwargs):
+        """ Updates the parameters of a Skynet Observation.
+
+        :param kwargs: Accepted keyword arguments include:
+            :Required:
+                - id (int | str): Observation ID
+            :Optional:
+                - Any Skynet ObservationSchema field/value to modify
+
+        :return: Dictionary matching Skynet ObservationSchema
+        """
+        obs_id = int(kwargs.pop('id'))
+
+        return handle_server_response(self.request('PUT', f'obs/{obs_id}', data=kwargs))
+
+    def get_observation(self, obs_id: int | str):
+        """ Retrieves a Skynet Observation.
+
+        :param obs_id: Observation ID
+        :return: Dictionary matching Skynet ObservationSchema
+        """
+        return handle_server_response(self.request('GET', f'obs/{int(obs_id)}'))
+
+    def close(self) -> None:
+        """ Closes the pooled connections of the session.
+        """
+        self.session.close()
+
+
+def get_client() -> SkynetClient:
+    """ Returns the process-wide Skynet API client, creating it on first
+    use.
+
+    :return: SkynetClient
+    """
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = SkynetClient()
+
+    return _client
+
+
+def add_observation(**kwargs):
+    """ Submits a request to the Skynet API to add an observation using
+    the shared client. See SkynetClient.add_observation.
+
+    :param kwargs: Dictionary of request parameters
+    :return: Dictionary matching Skynet ObservationSchema
+    """
+    return get_client().add_observation(**kwargs)
 
 
 def update_observation(**kwargs):
-    """ Updates the parameters of a Skynet Observation.
+    """ Updates the parameters of a Skynet Observation using the shared
+    client. See SkynetClient.update_observation.
 
     :param kwargs: Accepted keyword arguments include:
         :Required:
@@ -102,14 +228,13 @@ def update_observation(**kwargs):
 
     :return: Dictionary matching Skynet ObservationSchema
     """
-    obs_id = int(kwargs.pop('id'))
-
-    settings = config.read('pysad/config/api.ini')
-    request = {'data': kwargs, 'headers': {'Authentication-Token': get_api_key(settings)}}
+    return get_client().update_observation(**kwargs)
 
-    r = requests.request('PUT', f'{get_base_url(settings)}/obs/{obs_id}', **request)
 
-    if r.status_code != 200:
-        raise RuntimeError(r.text)
+def get_observation(obs_id: int | str):
+    """ Retrieves a Skynet Observation using the shared client.
 
-    return handle_server_response(r)
+    :param obs_id: Observation ID
+    :return: Dictionary matching Skynet ObservationSchema
+    """
+    return get_client().get_observation(obs_id)
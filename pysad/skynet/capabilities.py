@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, Tuple
+
+from pysad.utils import files
+
+
+"""
+    Telescope capabilities
+
+    Telescope capabilities is a cache of the filters each Skynet telescope
+    is known to support or reject. Capabilities are learned from the
+    responses of the Skynet API; e.g., the first observation rejected
+    because a telescope has no rprime filter. Requests are then built with
+    the fallback filter so that later observations are accepted on the
+    first attempt. The cache is kept on disk so that it is shared across
+    runs, and entries expire after a TTL so that changes to a telescope
+    are picked up again.
+"""
+
+
+CACHE_PATH = os.path.join('pysad', 'cache', 'capabilities.json')
+
+# Seconds until a learned capability expires
+TTL_SECONDS = 7 * 24 * 3600.
+
+# Filter requested instead of each filter a telescope does not have
+FALLBACK_FILTERS = {'rprime': 'R'}
+
+# Skynet error message of an exposure requesting a missing filter
+MISSING_FILTER = re.compile(r'has no filter "([^"]+)"')
+
+# Capabilities of each telescope: telescope -> {'supported'|'rejected': {filter: learned timestamp}}
+_capabilities = None
+_lock = threading.Lock()
+
+
+def load(path: str = CACHE_PATH) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """ Returns the unexpired capabilities read from disk. Returns no
+    capabilities if the cache does not exist or cannot be read.
+
+    :param path: cache path
+    :return: dictionary of capabilities of each telescope
+    """
+    try:
+        with open(path, 'r') as f:
+            capabilities = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+    expiry = time.time() - TTL_SECONDS
+
+    return {
+        telescope: {kind: {f: t for f, t in filters.items() if t > expiry} for kind, filters in known.items()}
+        for telescope, known in capabilities.items()
+    }
+
+
+def save(path: str = CACHE_PATH) -> None:
+    """ Merges the learned capabilities into the cache on disk, so that
+    capabilities learned by concurrent runs are kept. Must be called
+    with the lock held.
+
+    :param path: cache path
+    """
+    with files.locked(f'{path}.lock'):
+        merged = load(path)
+
+        for telescope, known in _capabilities.items():
+            for kind, filters in known.items():
+                merged.setdefault(telescope, {}).setdefault(kind, {}).update(filters)
+
+        with files.atomic_write(path) as f:
+            f.write(json.dumps(merged))
+
+
+def get_capabilities() -> Dict[str, Dict[str, Dict[str, float]]]:
+    """ Returns the process-wide capabilities, reading them from disk on
+    first use.
+
+    :return: dictionary of capabilities of each telescope
+    """
+    global _capabilities
+
+    if _capabilities is None:
+        with _lock:
+            if _capabilities is None:
+                _capabilities = load()
+
+    return _capabilities
+
+
+def is_rejected(telescope: str, filter_name: str) -> bool:
+    """ Checks if the telescope is known to not have the filter.
+
+    :param telescope: Telescope name
+    :param filter_name: Filter name; e.g., 'rprime'
+    :return: True if rejected and unexpired, False otherwise
+    """
+    learned = get_capabilities().get(telescope, {}).get('rejected', {}).get(filter_name)
+
+    return learned is not None and learned > time.time() - TTL_SECONDS
+
+
+def substitute(telescope: str, exps: str) -> str:
+    """ Replaces each filter the telescope is known to not have with its
+    fallback in serialized exposures.
+
+    :param telescope: Telescope name
+    :param exps: JSON serialized exposures
+    :return: JSON serialized exposures
+    """
+    for filter_name, fallback in FALLBACK_FILTERS.items():
+        if is_rejected(telescope, filter_name):
+            exps = exps.replace(f'"{filter_name}"', f'"{fallback}"')
+
+    return exps
+
+
+def learn(telescope: str, rejected: Iterable[str] = (), supported: Iterable[str] = ()) -> None:
+    """ Records filters the telescope was found to reject or support and
+    saves the capabilities if anything new was learned. A failed save is
+    logged; the capabilities are still used by this process.
+
+    :param telescope: Telescope name
+    :param rejected: Filter names the telescope does not have
+    :param supported: Filter names the telescope accepted
+    """
+    capabilities = get_capabilities()
+    expiry = time.time() - TTL_SECONDS
+
+    with _lock:
+        known = capabilities.setdefault(telescope, {})
+        changed = False
+
+        for kind, filters in (('rejected', rejected), ('supported', supported)):
+            learned = known.setdefault(kind, {})
+
+            for filter_name in filters:
+                if learned.get(filter_name, 0.) <= expiry:
+                    learned[filter_name] = time.time()
+                    changed = True
+
+        if changed:
+            try:
+                save()
+            except OSError as e:
+                logging.warning(f'Failed to save the telescope capabilities to {CACHE_PATH}: {e}')
+
+
+def parse_rejection(text: str) -> Tuple[str, str] | None:
+    """ Returns the rejected filter and its fallback if the Skynet error
+    message is caused by a missing filter that has a fallback.
+
+    :param text: Skynet error message
+    :return: tuple of rejected and fallback filter names or None
+    """
+    if (match := MISSING_FILTER.search(text)) and match.group(1) in FALLBACK_FILTERS:
+        return match.group(1), FALLBACK_FILTERS[match.group(1)]
+
+    return None
@@ -1,8 +1,24 @@
+import functools
+import operator
+from types import MappingProxyType
+from typing import Mapping, Tuple
+
 from pysad.utils import config
 from pysad.utils.string import snake_to_camel
 
 
 class Exposure:
+    __slots__ = ('telescope', 'filter_requested', 'exp_length', 'repeat', 'delay')
+
+    # Attributes sent to Skynet and their camel case keys
+    SERIALIZED = ('filter_requested', 'exp_length', 'delay')
+    WIRE_KEYS = tuple(map(snake_to_camel, SERIALIZED))
+
+    # Attributes read from the exposure config file
+    CONFIGURED = __slots__[1:]
+
+    _values = operator.attrgetter(*SERIALIZED)
+
     def __init__(self, telescope: str, section: str = 'Default'):
         self.telescope = telescope
         self.filter_requested = None
@@ -27,7 +43,17 @@ class Exposure:
 
         :return: Key value pairing of exposure attributes
         """
-        return {snake_to_camel(k): v for k, v in vars(self).items() if k not in ['telescope', 'repeat']}
+        return dict(zip(self.WIRE_KEYS, self._values(self)))
+
+    def to_requests(self) -> Tuple[Mapping, ...]:
+        """ Returns the exposure requests of an observation; one for each
+        repeat, of which only the later ones are delayed. The requests are
+        shared by every exposure with the same settings, so they are
+        read-only.
+
+        :return: tuple of read-only exposure requests
+        """
+        return exposure_requests(self.exp_length, self.filter_requested, self.repeat, self.delay)
 
     def set_attributes(self, section: str):
         """ Sets the class attributes based on defined variables in the
@@ -35,26 +61,39 @@ class Exposure:
 
         :param section: The exposure section config name
         """
-        settings = config.read('pysad/config/exposures.ini')
+        settings = config.section('pysad/config/exposures.ini', self.telescope.upper(), section)
 
-        for attribute, _ in vars(self).items():
-            if attribute != 'telescope':
-                self.set_attribute(settings, attribute, section)
+        for attribute in self.CONFIGURED:
+            self.set_attribute(settings, attribute)
 
-    def set_attribute(self, settings, attribute: str, section: str, required: bool = True):
-        """ Sets the attribute of the requested exposure. Prioritizes
-        the telescope section over the section stored in the class as
-        a way of allowing specific overrides. If the attribute is
-        required but not found, throws a ValueError.
+    def set_attribute(self, settings, attribute: str, required: bool = True):
+        """ Sets the attribute of the requested exposure. The settings
+        are expected to be the telescope section merged over the exposure
+        section as a way of allowing specific overrides. If the attribute
+        is required but not found, throws a ValueError.
 
-        :param settings: configparser.ConfigParser for exposures
+        :param settings: Merged exposure config snapshot
         :param attribute: The attribute to set
         :param required: Whether the attribute is required
-        :param section: Exposure section config name
         """
-        if value := config.get(settings, self.telescope.upper(), attribute):
-            setattr(self, attribute, config.expected_type(value))
-        elif value := config.get(settings, section, attribute):
-            setattr(self, attribute, config.expected_type(value))
+        if (value := settings.get(attribute)) is not None:
+            setattr(self, attribute, value)
         elif required:
             raise ValueError(f'Exposure config file is missing {attribute} information.')
+
+
+@functools.lru_cache(maxsize=None)
+def exposure_requests(exp_length: int, filter_requested: str, repeat: int, delay: int) -> Tuple[Mapping, ...]:
+    """ Returns the shared exposure requests of an observation. Settings
+    are few, so every observation with the same settings shares the
+    sequence rather than holding a copy.
+
+    :param exp_length: Exposure length in seconds
+    :param filter_requested: Filter name
+    :param repeat: Number of exposures
+    :param delay: Seconds between exposures
+    :return: tuple of read-only exposure requests
+    """
+    return tuple(MappingProxyType({'expLength': exp_length, 'filterRequested': filter_requested,
+                                   'delay': delay if i != 0 else None})
+                 for i in range(repeat))
@@ -1,11 +1,27 @@
-from typing import List, Dict
+import itertools
+import json
+import operator
+from typing import Dict, Iterator, List, Mapping, Tuple
 
+from pysad.skynet import capabilities
 from pysad.skynet.exposure import Exposure
-from pysad.utils import config, custom
+from pysad.utils import config, custom, metrics
 from pysad.utils.string import snake_to_camel
 
 
 class Observation:
+    __slots__ = ('name', 'ra_hours', 'dec_degs', 'is_too', 'too_justification', 'min_el', 'max_sun',
+                 'min_moon_sep_degs', 'efficiency', 'object_type', 'target_tracking', 'time_account_id',
+                 'telescopes', 'exps')
+
+    # Camel case keys of the attributes matching the Skynet observation object format
+    WIRE_KEYS = tuple(map(snake_to_camel, __slots__))
+
+    # Attributes read from the observation config file
+    CONFIGURED = __slots__[3:-2]
+
+    _values = operator.attrgetter(*__slots__)
+
     def __init__(self, telescope: str, galaxy: Dict = None, section: str = 'Default', exp_section: str = 'Default'):
         self.name = galaxy['name'] if galaxy else None
 
@@ -29,7 +45,7 @@ class Observation:
         self.time_account_id = None
         self.telescopes = telescope
 
-        self.exps: List = []
+        self.exps: Tuple[Mapping, ...] = ()
 
         self.from_config(telescope, section, exp_section)
 
@@ -44,14 +60,101 @@ class Observation:
         self.set_attributes(section)
         self.add_exposures(telescope, exp_section)
 
+    @classmethod
+    @metrics.timed('observation_build')
+    def build_many(cls, telescopes: List[str], galaxies: List[List[Dict]], section: str = 'Default',
+                   exp_section: str = 'Default', templates: Dict[Tuple[str, str, str], Dict] = None) -> List[Dict]:
+        """ Creates a serializable observation request for each galaxy.
+        The galaxies in galaxies[i] are observed by telescopes[i]. Since
+        requests only differ by the galaxy name and coordinates, a single
+        request template is compiled per telescope and section combination
+        and then stamped with each galaxy.
+
+        :param telescopes: Telescope names
+        :param galaxies: Galaxies to observe for each telescope
+        :param section: Observation section config name
+        :param exp_section: Exposure section config name
+        :param templates: Precompiled templates keyed by telescope,
+            section, and exposure section; e.g., of a prepared plan
+        :return: list of dictionary observation requests
+        """
+        return list(cls.iter_many(telescopes, galaxies, section, exp_section, templates))
+
+    @classmethod
+    def iter_many(cls, telescopes: List[str], galaxies: List[List[Dict]], section: str = 'Default',
+                  exp_section: str = 'Default', templates: Dict[Tuple[str, str, str], Dict] = None) -> Iterator[Dict]:
+        """ Lazily creates the observation requests of build_many in the
+        same order, so that the first requests can be submitted while the
+        others are still being created.
+
+        :param telescopes: Telescope names
+        :param galaxies: Galaxies to observe for each telescope
+        :param section: Observation section config name
+        :param exp_section: Exposure section config name
+        :param templates: Precompiled templates keyed by telescope,
+            section, and exposure section; e.g., of a prepared plan
+        :return: iterator of dictionary observation requests
+        """
+        templates = dict(templates or {})
+
+        # Handle custom config sections for every galaxy at once
+        if exp_section == '.DynamicMoon':
+            flat = [galaxy for group in galaxies for galaxy in group]
+            exp_sections = iter(custom.dynamic_moon_many([g['ra_hours'] for g in flat], [g['dec_degs'] for g in flat]))
+        else:
+            exp_sections = itertools.repeat(exp_section)
+
+        for telescope, group in zip(telescopes, galaxies):
+            for galaxy in group:
+                if (key := (telescope, section, str(next(exp_sections)))) not in templates:
+                    templates[key] = cls.compile_template(*key)
+
+                metrics.increment('observations_built')
+                yield cls.stamp(templates[key], galaxy)
+
+    @classmethod
+    @metrics.timed('template_compile')
+    def compile_template(cls, telescope: str, section: str = 'Default', exp_section: str = 'Default') -> Dict:
+        """ Returns a serializable observation request without the galaxy
+        name and coordinates. The exposures are serialized to JSON and
+        request the fallback of any filter the telescope is known to not
+        have.
+
+        :param telescope: Telescope name
+        :param section: Observation section config name
+        :param exp_section: Exposure section config name; cannot be custom
+        :return: dictionary observation request template
+        """
+        template = cls(telescope, section=section, exp_section=exp_section).to_dict()
+
+        for key in ('name', 'raHours', 'decDegs'):
+            del template[key]
+
+        template['exps'] = capabilities.substitute(telescope, json.dumps(template['exps']))
+
+        return template
+
+    @staticmethod
+    def stamp(template: Dict, galaxy: Dict) -> Dict:
+        """ Returns a copy of the request template for the galaxy.
+
+        :param template: Request template returned by compile_template
+        :param galaxy: name, ra, and dec of the galaxy
+        :return: dictionary observation request
+        """
+        return {'name': galaxy['name'], 'raHours': galaxy['ra_hours'], 'decDegs': galaxy['dec_degs'], **template}
+
     def to_dict(self) -> dict:
         """ Returns a dictionary representation of the observation. Keys
         are stored in camel case to match the Skynet observation object
-        format.
+        format. The shared exposure requests are copied.
 
         :return: Key value pairing of observation attributes
         """
-        return {snake_to_camel(k): v for k, v in vars(self).items()}
+        obs = dict(zip(self.WIRE_KEYS, self._values(self)))
+        obs['exps'] = [dict(exp) for exp in self.exps]
+
+        return obs
 
     def set_attributes(self, section: str) -> None:
         """ Sets the length of the requested exposure. Throws a ValueError
@@ -59,24 +162,22 @@ class Observation:
 
         :param section: Observation config option
         """
-        exclude = ['exps', 'name', 'ra_hours', 'dec_degs', 'telescopes']
-        settings = config.read('pysad/config/observation.ini')
+        settings = config.load('pysad/config/observation.ini')
 
-        for attribute, _ in vars(self).items():
-            if attribute not in exclude:
-                self.set_attribute(settings, attribute, section)
+        for attribute in self.CONFIGURED:
+            self.set_attribute(settings, attribute, section)
 
     def set_attribute(self, settings, attribute: str, section: str = 'Default', required: bool = True) -> None:
         """ Sets the attribute of the requested observation. If the attribute
         is required but not found, throws a ValueError.
 
-        :param settings: configparser.ConfigParser for observation
+        :param settings: Observation config snapshot
         :param attribute: The attribute to set
         :param section: The observation config section
         :param required: Whether the attribute is required
         """
-        if value := config.get(settings, section, attribute):
-            setattr(self, attribute, config.expected_type(value))
+        if (value := config.value(settings, section, attribute)) is not None:
+            setattr(self, attribute, value)
         elif required:
             raise ValueError(f'Observation config file is missing {attribute} information.')
 
@@ -90,20 +191,14 @@ class Observation:
         self.dec_degs = dec_degs
 
     def add_exposures(self, telescope: str, section: str = 'Default') -> None:
-        """ Creates a list of exposure requests for the observation.
+        """ Sets the exposure requests of the observation. The sequence is
+        shared with every observation using the same exposure settings.
 
         :param telescope: The telescope name
         :param section: The exposure config section name
         """
-        # Handle custom config sections
+        # Handle custom config sections. The moon is computed once per run
         if section == '.DynamicMoon':
             section = custom.dynamic_moon(self.ra_hours, self.dec_degs)
 
-        exp = Exposure(telescope, section)
-
-        for i in range(0, exp.repeat):
-            self.exps.append({
-                'expLength': exp.exp_length,
-                'filterRequested': exp.filter_requested,
-                'delay': exp.delay if i != 0 else None
-            })
+        self.exps = Exposure(telescope, section).to_requests()
@@ -0,0 +1,175 @@
+import itertools
+from typing import Dict, List, Sequence, Tuple
+
+import numpy
+
+
+"""
+    Assignment utility
+
+    Assignment utility is a collection of classes and methods for
+    assigning ranked galaxies to telescopes. Each telescope receives a
+    compact cluster of nearby galaxies, which it is able to observe,
+    ordered by a nearest-neighbour tour to reduce slewing time.
+"""
+
+
+# Number of candidate galaxies per queue slot. Leaves room for galaxies
+# that cannot be observed by any telescope to be replaced.
+CANDIDATE_FACTOR = 2
+
+
+class SkyIndex:
+    def __init__(self, ra_hours: Sequence[float], dec_degs: Sequence[float]):
+        self.vectors = unit_vectors(ra_hours, dec_degs)
+
+        # Whether each point can still be assigned
+        self.available = numpy.ones(len(self.vectors), dtype=bool)
+
+    def __len__(self) -> int:
+        return int(self.available.sum())
+
+    def first(self, allowed: numpy.ndarray = None) -> int | None:
+        """ Returns the first available point. Points are expected to be
+        indexed in ranked order, so this is the most probable galaxy.
+
+        :param allowed: boolean mask of the points that may be returned
+        :return: index of the point or None if no point is available
+        """
+        candidates = numpy.flatnonzero(self.mask(allowed))
+        return int(candidates[0]) if len(candidates) else None
+
+    def nearest(self, i: int, k: int, allowed: numpy.ndarray = None) -> numpy.ndarray:
+        """ Returns the k available points closest to point i, including
+        point i itself if available. Distances are compared by the dot
+        product of the unit vectors, which decreases with the angular
+        separation.
+
+        :param i: index of the point
+        :param k: number of points to return
+        :param allowed: boolean mask of the points that may be returned
+        :return: indices of the points sorted by distance
+        """
+        candidates = numpy.flatnonzero(self.mask(allowed))
+        dots = self.vectors[candidates] @ self.vectors[i]
+
+        if k < len(candidates):
+            closest = numpy.argpartition(-dots, k - 1)[:k]
+        else:
+            closest = numpy.arange(len(candidates))
+
+        return candidates[closest[numpy.argsort(-dots[closest], kind='stable')]]
+
+    def mask(self, allowed: numpy.ndarray = None) -> numpy.ndarray:
+        """ Returns which points are available and allowed.
+
+        :param allowed: boolean mask of the allowed points
+        :return: boolean mask of the points
+        """
+        return self.available if allowed is None else self.available & allowed
+
+    def take(self, indices: Sequence[int]) -> None:
+        """ Marks the points as assigned.
+
+        :param indices: indices of the points
+        """
+        self.available[indices] = False
+
+
+def unit_vectors(ra_hours: Sequence[float], dec_degs: Sequence[float]) -> numpy.ndarray:
+    """ Converts equatorial coordinates to cartesian unit vectors.
+
+    :param ra_hours: Right ascensions in hours
+    :param dec_degs: Declinations in degrees
+    :return: (N, 3) array of unit vectors
+    """
+    ra = numpy.radians(numpy.asarray(ra_hours, dtype=float) * 15.)
+    dec = numpy.radians(numpy.asarray(dec_degs, dtype=float))
+
+    return numpy.stack([numpy.cos(dec) * numpy.cos(ra), numpy.cos(dec) * numpy.sin(ra), numpy.sin(dec)], axis=-1)
+
+
+def assign(telescopes: List[str], galaxies: List[Dict], capacity: int | Sequence[int],
+           hours: numpy.ndarray = None) -> List[List[Dict]]:
+    """ Assigns the most probable galaxies to the telescopes. Each
+    telescope, in order, is seeded with the most probable galaxy left
+    that it can observe and receives the observable galaxies closest to
+    it, up to its capacity. The galaxies of each telescope are ordered by
+    a nearest-neighbour tour starting from the seed.
+
+    :param telescopes: Telescope names
+    :param galaxies: Galaxies in ranked order with ra_hours and dec_degs
+    :param capacity: Max number of galaxies for all or each telescope
+    :param hours: (galaxies, telescopes) array of observable hours as
+        returned by visibility.observable_hours; if not provided, every
+        telescope can observe every galaxy
+    :return: galaxies to observe for each telescope
+    """
+    if isinstance(capacity, int):
+        capacity = [capacity] * len(telescopes)
+
+    # The most probable galaxies that at least one telescope can observe
+    if hours is None:
+        keep = numpy.arange(min(len(galaxies), sum(capacity)))
+    else:
+        observable = numpy.asarray(hours).reshape(len(galaxies), len(telescopes)) > 0
+        keep = numpy.flatnonzero(observable.any(axis=1))[:sum(capacity)]
+
+    pool = [galaxies[i] for i in keep]
+    index = SkyIndex([g['ra_hours'] for g in pool], [g['dec_degs'] for g in pool])
+
+    groups = []
+    for t, k in enumerate(capacity):
+        allowed = None if hours is None else observable[keep, t]
+
+        if k <= 0 or (seed := index.first(allowed)) is None:
+            groups.append([])
+            continue
+
+        members = index.nearest(seed, k, allowed)
+        index.take(members)
+
+        groups.append([pool[i] for i in tour(index.vectors, members)])
+
+    return groups
+
+
+def interleave(telescopes: List[str], groups: List[List[Dict]]) -> Tuple[List[str], List[List[Dict]]]:
+    """ Interleaves the galaxies of each telescope in round-robin order so
+    that the seed of every telescope, its most probable galaxy, comes
+    first. The order of the galaxies of each telescope is preserved.
+
+    :param telescopes: Telescope names
+    :param groups: galaxies to observe for each telescope
+    :return: tuple of telescope names and single-galaxy groups in the
+        interleaved order
+    """
+    pairs = [pair for turn in itertools.zip_longest(*[[(t, g) for g in group] for t, group in zip(telescopes, groups)])
+             for pair in turn if pair is not None]
+
+    return [t for t, _ in pairs], [[g] for _, g in pairs]
+
+
+def tour(vectors: numpy.ndarray, members: Sequence[int]) -> List[int]:
+    """ Orders the points by a nearest-neighbour tour starting from the
+    first point.
+
+    :param vectors: (N, 3) array of unit vectors
+    :param members: indices of the points; the first one starts the tour
+    :return: indices of the points in tour order
+    """
+    members = numpy.asarray(members)
+    remaining = numpy.ones(len(members), dtype=bool)
+
+    order, current = [], 0
+    for _ in range(len(members)):
+        order.append(int(members[current]))
+        remaining[current] = False
+
+        if not remaining.any():
+            break
+
+        dots = numpy.where(remaining, vectors[members] @ vectors[members[current]], -numpy.inf)
+        current = int(numpy.argmax(dots))
+
+    return order
@@ -0,0 +1,73 @@
+from datetime import datetime
+from typing import List
+
+import numpy
+
+from pysad.skynet.exposure import Exposure
+from pysad.utils import config, custom, visibility
+from pysad.utils.results import ResultsIndex
+
+
+"""
+    Capacity utility
+
+    Capacity utility is a collection of methods for planning how many
+    observations each telescope can complete. A telescope's budget is
+    its dark time over the observing window divided by the time spent
+    on each observation, which depends on its resolved exposures.
+"""
+
+
+def budgets(telescopes: List[str], obs_section: str = 'Default', exp_section: str = 'Default',
+            cap: int = None, start: datetime = None) -> List[int]:
+    """ Returns the number of observations each telescope can complete
+    over the next visibility.WINDOW_HOURS hours.
+
+    :param telescopes: Telescope names
+    :param obs_section: Observation section config name
+    :param exp_section: Exposure section config name
+    :param cap: Max number of observations per telescope
+    :param start: Start of the observing window; defaults to now
+    :return: observation budget of each telescope
+    """
+    hours = visibility.dark_hours(telescopes, obs_section, start)
+
+    result = []
+    for telescope, dark in zip(telescopes, hours):
+        settings = config.section('pysad/config/exposures.ini', telescope.upper(), '.Capacity')
+
+        if numpy.isnan(dark):
+            dark = settings['dark_hours']
+
+        budget = int(dark * 3600 // observation_seconds(telescope, exp_section, settings['overhead']))
+        result.append(budget if cap is None else min(budget, cap))
+
+    return result
+
+
+def queue_space(telescopes: List[str], budgets: List[int], index: ResultsIndex) -> List[int]:
+    """ Returns how many observations can be added to each telescope
+    queue given the observations it already has. Observations that failed
+    to cancel still take up space.
+
+    :param telescopes: Telescope names
+    :param budgets: observation budget of each telescope
+    :param index: indexed observations of the event
+    :return: number of observations to add for each telescope
+    """
+    return [max(budget - len(index.by_telescope.get(tele, {})), 0) for tele, budget in zip(telescopes, budgets)]
+
+
+def observation_seconds(telescope: str, exp_section: str = 'Default', overhead: float = 0.) -> float:
+    """ Returns the telescope time spent on a single observation. The
+    delay between exposures is not included since the telescope observes
+    other targets in the meantime. For custom exposure sections, the
+    longest of the sections it can resolve to is used.
+
+    :param telescope: Telescope name
+    :param exp_section: Exposure section config name
+    :param overhead: seconds of slewing and readout per exposure
+    :return: seconds per observation
+    """
+    return max(exp.repeat * (exp.exp_length + overhead)
+               for exp in (Exposure(telescope, s) for s in custom.RESOLVED_SECTIONS.get(exp_section, (exp_section,))))
@@ -0,0 +1,139 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Tuple, Type
+
+
+"""
+    Concurrency utility functions
+
+    Concurrency utility is a collection of methods for running blocking
+    requests, such as Skynet API calls, across a bounded pool of worker
+    threads.
+"""
+
+
+DEFAULT_MAX_WORKERS = 8
+
+
+def map_isolated(func: Callable, items: Iterable, max_workers: int = DEFAULT_MAX_WORKERS,
+                 errors: Tuple[Type[Exception], ...] = (RuntimeError,),
+                 callback: Callable = None) -> List[Tuple[Any, Exception | None]]:
+    """ Calls the function on each item using at most max_workers threads.
+    Exceptions of the provided types are caught and returned in place of
+    the result so that one failed request does not affect the others.
+    Any other exception is raised. Outcomes are returned in the same order
+    as the items.
+
+    :param func: function accepting a single item
+    :param items: items to process
+    :param max_workers: maximum number of concurrent calls
+    :param errors: exception types to isolate per item
+    :param callback: function called with the item and its result as
+        soon as the item succeeds; called from the worker thread
+    :return: list of (result, exception) tuples; one of the pair is None
+    """
+    isolated = isolate(func, errors, callback)
+
+    items = list(items)
+
+    if max_workers <= 1 or len(items) <= 1:
+        return [isolated(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(isolated, items))
+
+
+def stream_isolated(func: Callable, items: Iterable, max_workers: int = DEFAULT_MAX_WORKERS, maxsize: int = None,
+                    errors: Tuple[Type[Exception], ...] = (RuntimeError,),
+                    callback: Callable = None) -> List[Tuple[Any, Any, Exception | None]]:
+    """ Calls the function on each item using at most max_workers threads
+    as soon as the item is produced. Unlike map_isolated, the items are
+    pulled lazily by a producer thread into a bounded queue, so the first
+    items are processed while later ones are still being produced and at
+    most maxsize items wait in memory. Exceptions are isolated as in
+    map_isolated. Any other exception, including one raised while
+    producing the items, stops the workers and is raised.
+
+    :param func: function accepting a single item
+    :param items: items to process; may be a generator
+    :param max_workers: maximum number of concurrent calls
+    :param maxsize: maximum number of produced items waiting to be
+        processed; defaults to twice max_workers
+    :param errors: exception types to isolate per item
+    :param callback: function called with the item and its result as
+        soon as the item succeeds; called from the worker thread
+    :return: list of (item, result, exception) tuples in the same order
+        as the items; one of result and exception is None
+    """
+    isolated = isolate(func, errors, callback)
+
+    max_workers = max(max_workers, 1)
+    tasks = queue.Queue(maxsize or 2 * max_workers)
+    stop = threading.Event()
+
+    outcomes, failures = {}, []
+
+    def produce() -> None:
+        try:
+            for i, item in enumerate(items):
+                if stop.is_set():
+                    break
+
+                tasks.put((i, item))
+        except BaseException as e:
+            failures.append(e)
+            stop.set()
+        finally:
+            for _ in range(max_workers):
+                tasks.put(None)
+
+    def consume() -> None:
+        while (task := tasks.get()) is not None:
+            if stop.is_set():
+                continue  # Drain the queue so that the producer is never blocked
+
+            try:
+                outcomes[task[0]] = (task[1], *isolated(task[1]))
+            except BaseException as e:
+                failures.append(e)
+                stop.set()
+
+    threads = [threading.Thread(target=produce, daemon=True)]
+    threads += [threading.Thread(target=consume, daemon=True) for _ in range(max_workers)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    if failures:
+        raise failures[0]
+
+    return [outcomes[i] for i in sorted(outcomes)]
+
+
+def isolate(func: Callable, errors: Tuple[Type[Exception], ...] = (RuntimeError,),
+            callback: Callable = None) -> Callable:
+    """ Wraps the function so that exceptions of the provided types are
+    returned in place of the result.
+
+    :param func: function accepting a single item
+    :param errors: exception types to isolate
+    :param callback: function called with the item and its result as
+        soon as the item succeeds
+    :return: function returning a (result, exception) tuple
+    """
+    def isolated(item):
+        try:
+            result = func(item)
+        except errors as e:
+            return None, e
+
+        if callback is not None:
+            callback(item, result)
+
+        return result, None
+
+    return isolated
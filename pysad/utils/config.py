@@ -1,5 +1,10 @@
 import configparser
-from typing import List
+import os
+import threading
+from types import MappingProxyType
+from typing import List, Mapping
+
+from pysad.utils import metrics
 
 
 """
@@ -10,6 +15,16 @@ from typing import List
 """
 
 
+EMPTY = MappingProxyType({})
+
+# Process-wide cache of parsed config files: (path, typed) -> (mtime, sections)
+_cache = {}
+_cache_lock = threading.Lock()
+
+# Cache of merged sections: (path, names) -> (sections, merged)
+_merged = {}
+
+
 def read(path: str) -> configparser.ConfigParser:
     """ Reads the telescope config file.
 
@@ -62,3 +77,95 @@ def expected_type(value: str) -> str | float | bool | List | None:
             return [expected_type(v.strip()) for v in value.split(',')]
 
         return value  # Return a string
+
+
+def freeze(value):
+    """ Returns an immutable version of the parsed config value. Lists
+    are converted to tuples.
+
+    :param value: parsed config value
+    :return: the immutable config value
+    """
+    return tuple(value) if isinstance(value, list) else value
+
+
+def load(path: str, typed: bool = True) -> Mapping[str, Mapping]:
+    """ Returns an immutable snapshot of every section of the config file.
+    The file is parsed once per process and cached by path. The cached
+    snapshot is invalidated when the modification time of the file
+    changes. A missing file results in an empty snapshot, matching the
+    behavior of configparser.ConfigParser.read.
+
+    :param path: path to the config file
+    :param typed: whether to convert values using expected_type
+    :return: mapping of section name to a mapping of option to value
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+
+    key = (path, typed)
+
+    if (cached := _cache.get(key)) and cached[0] == mtime:
+        return cached[1]
+
+    with _cache_lock:
+        if (cached := _cache.get(key)) and cached[0] == mtime:
+            return cached[1]
+
+        metrics.increment('config_parses')
+
+        with metrics.span('config_parse'):
+            parser = read(path)
+
+        sections = {}
+        for name in parser.sections():
+            sections[name] = MappingProxyType({
+                option: freeze(expected_type(value)) if typed else value
+                for option, value in parser.items(name)
+            })
+
+        sections = MappingProxyType(sections)
+        _cache[key] = (mtime, sections)
+
+    return sections
+
+
+def section(path: str, *names: str) -> Mapping:
+    """ Returns an immutable, typed snapshot of the provided sections
+    merged together. Sections listed first take priority which allows
+    for overrides; e.g., a telescope section over an exposure section.
+
+    :param path: path to the config file
+    :param names: section names ordered by priority
+    :return: mapping of option to value
+    """
+    settings = load(path)
+
+    # The snapshot object only changes when the file is re-parsed
+    if (cached := _merged.get((path, names))) and cached[0] is settings:
+        return cached[1]
+
+    merged = {}
+    for name in reversed(names):
+        merged.update({k: v for k, v in settings.get(name, EMPTY).items() if v != ''})
+
+    merged = MappingProxyType(merged)
+    _merged[(path, names)] = (settings, merged)
+
+    return merged
+
+
+def value(settings: Mapping[str, Mapping], section: str, option: str):
+    """ Retrieves the value from the provided config snapshot and section.
+    Returns None if the key is not found or has no value.
+
+    :param settings: config snapshot returned by load
+    :param section: section of the config file
+    :param option: option for the section
+    :return: the value of the key or None
+    """
+    if (result := settings.get(section, EMPTY).get(option)) == '':
+        return None
+    return result
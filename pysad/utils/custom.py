@@ -1,10 +1,14 @@
-import math
+import time
 from datetime import datetime
+from typing import TYPE_CHECKING, Sequence
 
-import ephem
+import numpy
 
 from pysad.utils import config
 
+if TYPE_CHECKING:
+    import ephem
+
 """
     Custom Configuration
     
@@ -15,6 +19,54 @@ from pysad.utils import config
 """
 
 
+# Exposure sections that each custom exposure section can resolve to
+RESOLVED_SECTIONS = {
+    '.DynamicMoon': ('DarkMoon', 'BrightMoon')
+}
+
+# Moon computed for the current run: (monotonic time computed, ephem.Moon)
+_moon = None
+
+# Max age in seconds of the computed moon before it is recomputed
+MOON_MAX_AGE = 3600
+
+
+def get_moon() -> 'ephem.Moon':
+    """ Returns the moon computed for the current time. The moon is
+    computed once per run and only recomputed by long-running processes
+    once it is older than MOON_MAX_AGE seconds. PyEphem is only imported
+    when the moon is needed.
+
+    :return: ephem.Moon with ra, dec (radians) and phase (percent)
+    """
+    global _moon
+
+    import ephem
+
+    if _moon is None or time.monotonic() - _moon[0] > MOON_MAX_AGE:
+        moon = ephem.Moon()
+        moon.compute(datetime.utcnow())
+        _moon = (time.monotonic(), moon)
+
+    return _moon[1]
+
+
+def set_moon(moon, computed: float) -> None:
+    """ Reuses a moon computed earlier, e.g., by the prepare action, as
+    if it was computed by get_moon. Ignored if the current moon is
+    newer.
+
+    :param moon: object with ra, dec (radians) and phase (percent)
+    :param computed: UNIX time the moon was computed
+    """
+    global _moon
+
+    computed = time.monotonic() - (time.time() - computed)
+
+    if _moon is None or _moon[0] < computed:
+        _moon = (computed, moon)
+
+
 def dynamic_moon(target_ra: float, target_dec: float) -> str:
     """ Determines the phase of the moon and proximity of the target to
     the moon and returns which moon exposure configuration to use.
@@ -25,29 +77,35 @@ def dynamic_moon(target_ra: float, target_dec: float) -> str:
     :param target_dec: declination in degrees
     :return: 'BrightMoon' or 'DarkMoon'
     """
-    settings = config.read('pysad/config/exposures.ini')
+    return str(dynamic_moon_many([target_ra], [target_dec])[0])
+
 
-    max_phase = config.get(settings, '.DynamicMoon', 'max_phase')
-    min_sep_degs = config.get(settings, '.DynamicMoon', 'min_sep_degs')
+def dynamic_moon_many(target_ra: Sequence[float], target_dec: Sequence[float]) -> numpy.ndarray:
+    """ Determines which moon exposure configuration to use for each
+    target. The moon is computed once and the separation of every target
+    from the moon is computed at once using the haversine formula.
+
+    :param target_ra: Right ascensions in hours
+    :param target_dec: Declinations in degrees
+    :return: array of 'BrightMoon' or 'DarkMoon'
+    """
+    settings = config.load('pysad/config/exposures.ini')
 
-    # Get the moon ra, dec, and phase
-    moon = ephem.Moon()
-    moon.compute(datetime.utcnow())
+    max_phase = config.value(settings, '.DynamicMoon', 'max_phase')
+    min_sep_degs = config.value(settings, '.DynamicMoon', 'min_sep_degs')
 
-    if moon.phase < config.expected_type(max_phase):
-        return 'DarkMoon'
+    ra_rads = numpy.radians(numpy.asarray(target_ra, dtype=float) * 15.)
+    dec_rads = numpy.radians(numpy.asarray(target_dec, dtype=float))
 
-    # Determine the separation of the target and moon
-    sep_ra_rads = math.radians(math.fabs(target_ra - moon.ra))
-    sep_dec_rads = math.radians(math.fabs(target_dec - moon.dec))
+    # Get the moon ra, dec (radians), and phase
+    moon = get_moon()
 
-    separation = math.pow(math.sin(sep_dec_rads / 2.0), 2.0)
-    separation += (math.cos(math.radians(moon.dec)) *
-                   math.cos(math.radians(target_dec)) *
-                   math.pow(math.sin(sep_ra_rads / 2.0), 2.0))
-    separation = math.degrees(2.0 * math.asin(math.sqrt(separation)))
+    if moon.phase < max_phase:
+        return numpy.full(ra_rads.shape, 'DarkMoon')
 
-    if separation >= config.expected_type(min_sep_degs):
-        return 'DarkMoon'
+    # Determine the separation of the targets and moon
+    separation = numpy.sin((dec_rads - moon.dec) / 2.0) ** 2
+    separation += numpy.cos(moon.dec) * numpy.cos(dec_rads) * numpy.sin((ra_rads - moon.ra) / 2.0) ** 2
+    separation = numpy.degrees(2.0 * numpy.arcsin(numpy.sqrt(numpy.clip(separation, 0.0, 1.0))))
 
-    return 'BrightMoon'
+    return numpy.where(separation >= min_sep_degs, 'DarkMoon', 'BrightMoon')
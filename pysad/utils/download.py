@@ -0,0 +1,226 @@
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import ContextManager, Tuple
+
+import requests
+
+from pysad.utils import files, metrics
+
+
+"""
+    Download utility functions
+
+    Download utility is a collection of methods for streaming HTTP
+    downloads to disk through a local, content-addressed cache. Cached
+    URLs are revalidated with conditional requests (ETag and
+    Last-Modified) so that unchanged content costs a single small round
+    trip. The cache is bounded in size and evicts the least recently
+    used content first. The cache is shared by parallel processes, so its
+    index is only updated while holding a lock file.
+"""
+
+
+CACHE_DIRECTORY = os.path.join('pysad', 'cache', 'downloads')
+
+# Max total size in bytes of the cached content
+MAX_CACHE_BYTES = 512 * 1024 ** 2
+
+# Size in bytes of each chunk streamed to disk
+CHUNK_SIZE = 1024 ** 2
+
+# Seconds to wait for a connection, and for each read of the response
+TIMEOUT = (10., 60.)
+
+_session = None
+_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """ Returns the process-wide keep-alive session used for downloads.
+
+    :return: requests.Session
+    """
+    global _session
+
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = requests.Session()
+
+    return _session
+
+
+@metrics.timed('ned_fetch')
+def fetch(url: str, directory: str = CACHE_DIRECTORY, max_bytes: int = MAX_CACHE_BYTES,
+          conditional: bool = True, timeout: Tuple[float, float] = TIMEOUT) -> str:
+    """ Downloads the URL into the cache and returns the path of the
+    cached content. If the URL was downloaded before, a conditional
+    request is sent and the cached content is reused if the server
+    responds with 304 Not Modified. If another process evicted the
+    content meanwhile, the URL is downloaded again. Throws a RuntimeError
+    if the server responds with any other unsuccessful status.
+
+    :param url: URL to download
+    :param directory: cache directory
+    :param max_bytes: max total size in bytes of the cache
+    :param conditional: whether cached content is revalidated rather
+        than downloaded again
+    :param timeout: seconds to wait for a connection, and for each read
+        of the response
+    :return: path to the cached content
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    with lock_index(directory):
+        entry = read_index(directory)['urls'].get(url)
+
+    headers = {}
+    if conditional and entry and os.path.exists(content_path(directory, entry['digest'])):
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    with get_session().get(url, headers=headers, stream=True, timeout=timeout) as r:
+        metrics.increment('ned_requests')
+
+        if r.status_code == 304 and headers:
+            metrics.increment('ned_not_modified')
+            digest = entry['digest']
+        elif r.status_code == 200:
+            digest = save(r, directory)
+            entry = {'digest': digest, 'etag': r.headers.get('ETag'), 'last_modified': r.headers.get('Last-Modified')}
+        else:
+            metrics.increment('ned_failures')
+            raise RuntimeError(r.text)
+
+    path = content_path(directory, digest)
+
+    with lock_index(directory):
+        if missing := not os.path.exists(path):
+            metrics.increment('ned_evicted')
+        else:
+            index = read_index(directory)
+
+            index['urls'][url] = entry
+            index['contents'][digest] = {'size': os.path.getsize(path), 'accessed': time.time()}
+
+            evict(index, directory, max_bytes, keep=digest)
+            write_index(directory, index)
+
+    # Evicted by another process since it was revalidated or downloaded
+    if missing:
+        return fetch(url, directory, max_bytes, conditional=False, timeout=timeout)
+
+    return path
+
+
+def save(response: requests.Response, directory: str) -> str:
+    """ Streams the response body to the cache in chunks while hashing
+    it. The content is stored under its SHA-256 digest. The partially
+    written content is removed if the download fails.
+
+    :param response: streamed requests.Response
+    :param directory: cache directory
+    :return: SHA-256 digest of the content
+    """
+    sha256 = hashlib.sha256()
+    tmp_path = files.temp_path(os.path.join(directory, '.download'))
+
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                sha256.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+
+        digest = sha256.hexdigest()
+        os.replace(tmp_path, content_path(directory, digest))
+    finally:
+        # Only left behind if the download failed
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+
+    metrics.increment('ned_bytes_downloaded', size)
+    metrics.observe('ned_download_bytes', size, metrics.SIZE_BUCKETS)
+
+    return digest
+
+
+def evict(index: dict, directory: str, max_bytes: int, keep: str = None) -> None:
+    """ Removes the least recently used content until the cache is no
+    larger than max_bytes. URLs referring to evicted content are removed
+    from the index.
+
+    :param index: cache index returned by read_index
+    :param directory: cache directory
+    :param max_bytes: max total size in bytes of the cache
+    :param keep: digest of content that must not be evicted
+    """
+    total = sum(content['size'] for content in index['contents'].values())
+
+    for digest, content in sorted(index['contents'].items(), key=lambda item: item[1]['accessed']):
+        if total <= max_bytes:
+            break
+
+        if digest == keep:
+            continue
+
+        try:
+            os.remove(content_path(directory, digest))
+        except FileNotFoundError:
+            pass
+
+        total -= content['size']
+        del index['contents'][digest]
+
+    index['urls'] = {url: entry for url, entry in index['urls'].items() if entry['digest'] in index['contents']}
+
+
+def content_path(directory: str, digest: str) -> str:
+    """ Returns the path of the cached content with the provided digest.
+
+    :param directory: cache directory
+    :param digest: SHA-256 digest of the content
+    :return: path to the cached content
+    """
+    return os.path.join(directory, digest)
+
+
+def lock_index(directory: str) -> ContextManager[None]:
+    """ Returns a lock on the cache index that excludes other threads
+    and processes sharing the cache directory.
+
+    :param directory: cache directory
+    :return: context manager holding the lock
+    """
+    return files.locked(os.path.join(directory, 'index.json.lock'))
+
+
+def read_index(directory: str) -> dict:
+    """ Reads the cache index. Returns an empty index if it does not
+    exist.
+
+    :param directory: cache directory
+    :return: dictionary of cached urls and contents
+    """
+    try:
+        with open(os.path.join(directory, 'index.json'), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'urls': {}, 'contents': {}}
+
+
+def write_index(directory: str, index: dict) -> None:
+    """ Writes the cache index.
+
+    :param directory: cache directory
+    :param index: dictionary of cached urls and contents
+    """
+    with files.atomic_write(os.path.join(directory, 'index.json')) as f:
+        f.write(json.dumps(index))
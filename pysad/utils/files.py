@@ -0,0 +1,86 @@
+import contextlib
+import os
+import threading
+from typing import IO, Iterator
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+"""
+    File utility functions
+
+    File utility is a collection of methods for safely writing files
+    that are shared by concurrent threads and processes; e.g., the
+    caches and results of parallel jobs. Files are written to a temporary
+    file unique to the writer and then moved into place, so readers never
+    see a partially written file. Read-modify-write updates are guarded
+    by lock files.
+"""
+
+
+def temp_path(path: str) -> str:
+    """ Returns a temporary path next to the path that is unique to the
+    calling process and thread.
+
+    :param path: path of the file to write
+    :return: temporary path
+    """
+    return f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+
+@contextlib.contextmanager
+def atomic_write(path: str, mode: str = 'w', sync: bool = False) -> Iterator[IO]:
+    """ Opens a temporary file that replaces the file at path once the
+    block exits. The temporary file is removed if the block raises.
+
+    :param path: path of the file to write
+    :param mode: open mode; 'w' or 'wb'
+    :param sync: whether the content is forced to disk before the file
+        is replaced
+    :return: open temporary file
+    """
+    tmp_path = temp_path(path)
+
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+
+@contextlib.contextmanager
+def locked(path: str) -> Iterator[None]:
+    """ Holds an exclusive lock on the lock file at path, blocking until
+    it is acquired. Excludes other processes as well as other threads.
+
+    :param path: path of the lock file; e.g., 'index.json.lock'
+    """
+    if directory := os.path.dirname(path):
+        os.makedirs(directory, exist_ok=True)
+
+    with open(path, 'a+') as f:
+        if os.name == 'nt':
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -1,87 +1,436 @@
+import csv
+import itertools
+import json
 import os
-from typing import List, Dict
+import shutil
+import threading
+from typing import Dict, Iterator, List, Sequence, TextIO, Tuple
 
-import pandas
-import requests
-from pathlib import Path
+import numpy
 
+from pysad.utils import download, files, metrics, scoring
 from pysad.utils.string import sanitize
 
 # DONE: Sort galaxies by probability 
 
 # TODO: Add support for FITs files - GalaxyDB -> FitsDB, CsvDB (?)
-# TODO: Sort galaxies by probability after querying, then overwrite file
+# DONE: Sort galaxies by probability after querying, then overwrite file
+
+# NED Gravitational Wave Followup (GWF) galaxy list service
+BASE_URL = "https://ned.ipac.caltech.edu/uri/NED::GWFglist/"
+
+# Column layout of the memory-mapped galaxy cache, sorted by probability.
+# Every other column of the galaxy list follows as a float column
+COLUMNS = [('ra', 'f8'), ('dec', 'f8'), ('P_3D', 'f8'), ('P_LumW1', 'f8'), ('probability', 'f8'), ('row', 'i8')]
+
+# Format version of the galaxy cache; bumped when its layout changes
+CACHE_VERSION = 2
+
+# Number of CSV rows converted into columns at a time
+CHUNK_ROWS = 65536
+
 
 class GalaxyDB:
-    def __init__(self, event: str):
-        self.base_url = "https://ned.ipac.caltech.edu/uri/NED::GWFglist/"
+    def __init__(self, event: str, serial: str = 'latest', profile: str = None):
+        self.base_url = BASE_URL
         self.event = event
+        self.serial = serial
+        self.directory = os.path.join('pysad', 'results', event)
+
+        # Scoring profile config name; ranks by probability if None
+        self.profile = profile
+
+        # Downloaded lazily the first time the galaxies are needed
         self.path = None
 
-        self.create()
+        # Digest of the downloaded galaxy list content
+        self.revision = None
+
+        # Allows the galaxies to be prefetched from another thread
+        self._lock = threading.RLock()
 
     def create(self):
         """ Queries the event URL and saves the result to disk.
-
-        :return: list of objects containing galaxy name, ra, and dec
         """
-        self.save_to_disk(self.query())
+        self.save_to_disk(self.query(self.serial))
 
-    def query(self, serial_number: str = 'latest') -> requests.models.Response:
+    def query(self, serial_number: str = 'latest') -> str:
         """ Queries the events produced by the NED Gravitational Wave
-         Followup (GWF) service.
+        Followup (GWF) service. The CSV is streamed into the download
+        cache. If it was downloaded before, it is only downloaded again
+        if it changed.
 
         :param serial_number: VOEvent Serial number ('1', '2', ..., or 'latest')
-        :return: requests.response.status_code
+        :return: path to the cached CSV
         """
-        r = requests.get(f"{self.base_url}/csv/{self.event}/{serial_number}")
-
-        if r.status_code != 200:
-            raise RuntimeError(r.text)
-
-        return r
+        return download.fetch(f"{self.base_url.rstrip('/')}/csv/{self.event}/{serial_number}")
 
     def get(self, start: int = None, limit: int = None) -> List[Dict]:
         """ Returns a list of objects containing galaxy name, ra (hours),
-        and dec (degrees). The number of rows returned is the maximum
-        of the provided limit and the number of rows in the file.
+        and dec (degrees) sorted by descending probability, or score if
+        a scoring profile is used. Paging is applied after ranking.
 
-        :param start: Starting row to return
+        :param start: Starting rank to return
         :param limit: number of rows to return
         :return: list of objects containing galaxy name, ra, and dec
         """
+        columns = self.columns(start, limit)
+
+        return [{'name': name, 'ra_hours': ra / 15., 'dec_degs': dec}
+                for name, ra, dec in zip(columns['name'].tolist(), columns['ra'].tolist(), columns['dec'].tolist())]
+
+    def columns(self, start: int = None, limit: int = None) -> numpy.ndarray:
+        """ Returns a slice of the memory-mapped galaxy cache sorted by
+        descending probability, or score if a scoring profile is used. The
+        probability slice is zero-copy. The cache is created from the
+        downloaded CSV the first time it is needed, or if the CSV is
+        newer than the cache. Safe to call from multiple threads; the CSV
+        is only downloaded once.
+
+        :param start: Starting rank to return
+        :param limit: number of rows to return
+        :return: read-only structured array with name, ra, dec (degrees),
+            P_3D, P_LumW1, probability, original row, and every other
+            column of the galaxy list
+        """
+        with self._lock:
+            csv_path = self.csv_path
+
+            if not os.path.exists(self.cache_path) or os.path.getmtime(self.cache_path) < os.path.getmtime(csv_path):
+                self.save_columns()
+
+        start = start or 0
+        stop = None if limit is None else start + limit
+
+        columns = numpy.load(self.cache_path, mmap_mode='r')
+
+        if self.profile is None:
+            return columns[start:stop]
+
+        return columns[scoring.rank(self.scores(columns), start, stop)]
+
+    def scores(self, columns: numpy.ndarray) -> numpy.ndarray:
+        """ Returns the score of every galaxy of the cache under the
+        scoring profile. Scores are cached on disk per event, serial, and
+        profile, so re-ranking only costs a partial sort. The cached
+        scores are recomputed if the profile or galaxy cache changes.
+
+        :param columns: memory-mapped galaxy cache
+        :return: array of scores in the order of the cache
+        """
+        profile = scoring.get_profile(self.profile)
+        path = self.score_path(profile)
+
+        with self._lock:
+            cached = os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(self.cache_path)
+
+            if profile.cacheable and cached:
+                return numpy.load(path, mmap_mode='r')
+
+            scores = scoring.evaluate(columns, profile)
+
+            if profile.cacheable:
+                with files.atomic_write(path, 'wb') as f:
+                    numpy.save(f, scores)
+
+        return scores
+
+    @property
+    def csv_path(self) -> str:
+        """ Returns the path of the downloaded CSV. The CSV is downloaded
+        if it has not been yet. Throws a ValueError if the CSV does not
+        exist.
+
+        :return: path to the CSV file
+        """
+        with self._lock:
+            if self.path is None:
+                self.create()
+
         if not os.path.exists(self.path):
             raise ValueError(f"{self.path} does not exist. Did you run 'save_to_disk'?")
 
         if not self.path.endswith('csv'):
             raise IOError(f"{self.path} is not a CSV file.")
 
-        result = []
-        with open(self.path, newline='') as csvfile:
-            rows = pandas.read_csv(csvfile, skiprows=start, nrows=limit)
+        return self.path
+
+    @property
+    def serial_number(self) -> int:
+        """ Returns the serial number of the downloaded galaxy list. A
+        numbered serial is its own number. Since NED publishes a revision
+        of the 'latest' galaxy list with each VOEvent serial, 'latest'
+        revisions are numbered in the order they are first seen, starting
+        from 1. The numbers are tracked in 'pysad/results/<event>/serials.json',
+        which is locked so that concurrent runs number revisions the same.
+
+        :return: serial number
+        """
+        with self._lock:
+            # Downloads the galaxy list if it has not been yet
+            self.csv_path
+
+            if self.serial.isdigit():
+                return int(self.serial)
+
+            path = os.path.join(self.directory, 'serials.json')
+
+            with files.locked(f'{path}.lock'):
+                try:
+                    with open(path, 'r') as f:
+                        serials = json.load(f)
+                except FileNotFoundError:
+                    serials = {}
+
+                revisions = serials.setdefault(self.serial, [])
+
+                if self.revision not in revisions:
+                    revisions.append(self.revision)
+
+                    with files.atomic_write(path) as f:
+                        f.write(json.dumps(serials))
+
+            return revisions.index(self.revision) + 1
+
+    def ranked_names(self, serial_number: int = None) -> numpy.ndarray | None:
+        """ Returns the names of the galaxies of a serial in ranked order.
+        The names of the downloaded serial are saved so that later
+        serials can be compared against it.
+
+        :param serial_number: serial number; defaults to the downloaded serial
+        :return: array of names or None if the serial was never ranked
+        """
+        current = self.serial_number
+        path = self.names_path(current if serial_number is None else serial_number)
+
+        with self._lock:
+            if serial_number in (None, current) and not os.path.exists(path):
+                with files.atomic_write(path, 'wb') as f:
+                    numpy.save(f, self.columns()['name'])
+
+        return numpy.load(path) if os.path.exists(path) else None
+
+    def delta(self, previous: int, limit: int = None) -> 'Delta | None':
+        """ Computes the changes from a previous serial to the downloaded
+        serial. If limit is provided, only the galaxies ranked before it
+        in either serial are compared.
+
+        :param previous: serial number of the previous galaxy list
+        :param limit: number of top ranked galaxies to compare
+        :return: Delta or None if the previous serial was never ranked
+        """
+        if (names := self.ranked_names(previous)) is None:
+            return None
+
+        return diff(names[:limit].tolist(), self.ranked_names()[:limit].tolist())
+
+    @property
+    def cache_path(self) -> str:
+        """ Returns the path of the memory-mapped galaxy cache for the
+        event and serial.
+
+        :return: path to the .npy galaxy cache
+        """
+        return os.path.join(self.directory, f'{self.event}_{self.serial}.v{CACHE_VERSION}.npy')
+
+    def score_path(self, profile: scoring.Profile) -> str:
+        """ Returns the path of the cached scores of the profile for the
+        event and serial.
+
+        :param profile: scoring profile
+        :return: path to the .npy scores
+        """
+        return os.path.join(self.directory,
+                            f'{self.event}_{self.serial}.{sanitize(profile.name)}.{profile.digest}.scores.npy')
+
+    def names_path(self, serial_number: int) -> str:
+        """ Returns the path of the ranked galaxy names of a serial under
+        the ranking of the scoring profile.
+
+        :param serial_number: serial number
+        :return: path to the .npy names
+        """
+        ranking = 'probability'
+        if self.profile is not None:
+            profile = scoring.get_profile(self.profile)
+            ranking = f'{sanitize(profile.name)}.{profile.digest}'
+
+        return os.path.join(self.directory, f'{self.event}_{serial_number}.{ranking}.names.npy')
+
+    @metrics.timed('galaxies_rank')
+    def save_columns(self) -> None:
+        """ Converts the downloaded CSV into the columnar galaxy cache.
+        """
+        with open(self.csv_path, newline='') as csvfile:
+            columns = read_columns(csvfile)
 
-            rows['probability'] = rows['P_3D'] * rows['P_LumW1']
-            rows = rows.sort_values(by='probability', ascending=False)
+        # Stable, so galaxies of equal probability keep the order of the list
+        columns = columns[numpy.argsort(-columns['probability'], kind='stable')]
 
-            for row in rows.values:
-                result.append({'name': sanitize(str(row[0])), 'ra_hours': row[1] / 15., 'dec_degs': row[2]})
+        os.makedirs(self.directory, exist_ok=True)
 
-        return result
+        with files.atomic_write(self.cache_path, 'wb') as f:
+            numpy.save(f, columns)
 
-    def save_to_disk(self, response: requests.Response) -> None:
-        """ Writes the Requests.Response object to disk using the specified
-        file_format. Allows for overwriting of existing files since the
-        user may query the 'latest' version multiple times.
+    def save_to_disk(self, path: str) -> None:
+        """ Places the cached CSV at 'pysad/results/<event>/<event>_<serial>.csv'.
+        The CSV is hard linked when possible, otherwise copied. Allows for
+        overwriting of existing files since the user may query the
+        'latest' version multiple times.
 
-        :param response: Requests.Response object
+        :param path: path to the cached CSV
         """
-        event_directory = rf"{Path.cwd()}\\pysad\\results\\{self.event}"
-        output_path = f"{event_directory}\\{self.event}.csv"
+        output_path = os.path.join(self.directory, f'{self.event}_{self.serial}.csv')
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        if not os.path.exists(output_path) or not os.path.samefile(path, output_path):
+            tmp_path = files.temp_path(output_path)
+
+            try:
+                os.link(path, tmp_path)
+            except OSError:
+                shutil.copyfile(path, tmp_path)
 
-        if not os.path.exists(event_directory):
-            os.mkdir(event_directory)
+            os.replace(tmp_path, output_path)
 
-        with open(output_path, "wb") as file:
-            file.write(response.content)
+            # The linked CSV may be older than the cache built from the previous one
+            if os.path.exists(self.cache_path):
+                os.remove(self.cache_path)
 
+        # Cached content is addressed by its digest
+        self.revision = os.path.basename(path)
         self.path = output_path
+
+
+class Delta:
+    def __init__(self, entered: Dict[str, int], dropped: Dict[str, int], moved: Dict[str, Tuple[int, int]]):
+        # Galaxies only in the current list and their rank
+        self.entered = entered
+
+        # Galaxies only in the previous list and their previous rank
+        self.dropped = dropped
+
+        # Galaxies in both lists at different ranks: (previous rank, rank)
+        self.moved = moved
+
+    def __len__(self) -> int:
+        return len(self.entered) + len(self.dropped) + len(self.moved)
+
+
+def diff(previous: Sequence[str], current: Sequence[str]) -> Delta:
+    """ Computes which galaxies entered, dropped out of, or changed rank
+    between two ranked lists of galaxy names in time linear in their
+    length, using a hash index over the previous names.
+
+    :param previous: galaxy names of the previous list in ranked order
+    :param current: galaxy names of the current list in ranked order
+    :return: Delta
+    """
+    index = {name: rank for rank, name in enumerate(previous)}
+
+    entered, moved = {}, {}
+    for rank, name in enumerate(current):
+        if (old := index.pop(name, None)) is None:
+            entered[name] = rank
+        elif old != rank:
+            moved[name] = (old, rank)
+
+    # Every name left in the index is not in the current list
+    return Delta(entered, index, moved)
+
+
+def read_columns(csvfile: TextIO) -> numpy.ndarray:
+    """ Reads a NED GWF galaxy list into the columns of the galaxy cache
+    in list order. Rows are converted CHUNK_ROWS at a time, so only one
+    chunk of rows is held as Python objects.
+
+    :param csvfile: open CSV file
+    :return: structured array with the fields of the galaxy cache
+    """
+    extras = [name for _, name in extra_columns(next(csv.reader(csvfile)))]
+    csvfile.seek(0)
+
+    fields = ('probability', 'name', 'ra', 'dec', 'P_3D', 'P_LumW1', 'row')
+    dtype = COLUMNS + [(name, 'f8') for name in extras]
+
+    rows = read_rows(csvfile)
+    chunks = []
+    while chunk := list(itertools.islice(rows, CHUNK_ROWS)):
+        names = numpy.array([row[1] for row in chunk], dtype=str)
+        columns = numpy.empty(len(chunk), dtype=[('name', names.dtype)] + dtype)
+        columns['name'] = names
+
+        for index, field in enumerate(fields):
+            if field != 'name':
+                columns[field] = [row[index] for row in chunk]
+
+        for index, field in enumerate(extras):
+            columns[field] = [row[-1][index] for row in chunk]
+
+        chunks.append(columns)
+
+    width = max((chunk.dtype['name'].itemsize // 4 for chunk in chunks), default=1)
+    columns = numpy.empty(sum(len(chunk) for chunk in chunks), dtype=[('name', f'U{width}')] + dtype)
+
+    start = 0
+    while chunks:
+        chunk = chunks.pop(0)
+        for field in columns.dtype.names:
+            columns[field][start:start + len(chunk)] = chunk[field]
+        start += len(chunk)
+
+    return columns
+
+
+def read_rows(csvfile: TextIO) -> Iterator[Tuple[float, str, float, float, float, float, int, Tuple]]:
+    """ Lazily reads the rows of a NED GWF galaxy list. The first three
+    columns are expected to be the galaxy name, ra (degrees), and dec
+    (degrees). Missing probabilities are treated as zero. The values of
+    the extra columns are read as floats; missing values are NaN.
+
+    :param csvfile: open CSV file
+    :return: iterator of (probability, name, ra, dec, P_3D, P_LumW1, row,
+        extras) tuples
+    """
+    reader = csv.reader(csvfile)
+    header = next(reader)
+
+    p_3d, p_lum_w1 = header.index('P_3D'), header.index('P_LumW1')
+    extras = [index for index, _ in extra_columns(header)]
+
+    for i, row in enumerate(reader):
+        if row:
+            p = to_float(row[p_3d]), to_float(row[p_lum_w1])
+            yield (p[0] * p[1], sanitize(row[0]), float(row[1]), float(row[2]), p[0], p[1], i,
+                   tuple(to_float(row[j], numpy.nan) if j < len(row) else numpy.nan for j in extras))
+
+
+def extra_columns(header: List[str]) -> List[Tuple[int, str]]:
+    """ Returns the columns of a NED GWF galaxy list other than the
+    galaxy name, ra, dec, and the columns of the cache layout; e.g.,
+    DistMpc. The extra columns can be used by scoring profiles.
+
+    :param header: header row of the CSV
+    :return: list of (index, name) tuples
+    """
+    reserved = {'name', 'P_3D', 'P_LumW1'} | {name for name, _ in COLUMNS}
+
+    return [(index, name) for index, name in enumerate(header)
+            if index > 2 and name not in reserved and name not in header[:index]]
+
+
+def to_float(value: str, default: float = 0.) -> float:
+    """ Converts a CSV value to a float. Empty, invalid, or NaN values
+    are treated as the default.
+
+    :param value: CSV value
+    :param default: value of empty, invalid, or NaN values
+    :return: float value
+    """
+    try:
+        number = float(value)
+    except ValueError:
+        return default
+
+    return number if number == number else default
@@ -0,0 +1,277 @@
+import bisect
+import functools
+import json
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Sequence
+
+from pysad.utils import files
+
+
+"""
+    Metrics utility
+
+    Metrics utility is a lightweight instrumentation API for timing the
+    stages of a run and counting what they did. Spans time a block of
+    code and are collected into histograms; counters accumulate values
+    such as the number of requests sent or bytes downloaded. A summary
+    of the run can be dumped to JSON or to a Prometheus text file.
+
+    Instrumentation is disabled by default. While disabled, spans,
+    counters, and histograms are no-ops that cost a single global check.
+"""
+
+
+# Upper bounds in seconds of the span histogram buckets
+SPAN_BUCKETS = (.001, .005, .01, .025, .05, .1, .25, .5, 1., 2.5, 5., 10., 30., 60.)
+
+# Upper bounds in bytes of the size histogram buckets; 1 KiB to 1 GiB
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(11))
+
+# Prefix of the exported Prometheus metric names
+PREFIX = 'pysad'
+
+# Metrics of the current run or None if disabled
+_registry = None
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = SPAN_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value: float) -> None:
+        """ Adds the value to the histogram.
+
+        :param value: observed value
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def to_dict(self) -> Dict:
+        """ Returns a serializable summary of the histogram.
+
+        :return: dictionary with count, sum, min, max, mean, and the
+            cumulative count of each bucket
+        """
+        cumulative = [sum(self.counts[:i + 1]) for i in range(len(self.buckets))]
+
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'mean': self.sum / self.count if self.count else None,
+            'buckets': dict(zip(map(str, self.buckets), cumulative))
+        }
+
+
+class Registry:
+    def __init__(self):
+        self.started = time.time()
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.spans: Dict[str, Histogram] = {}
+
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """ Adds the value to a counter.
+
+        :param name: counter name
+        :param value: value to add
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = SPAN_BUCKETS, spans: bool = False) -> None:
+        """ Adds the value to a histogram, creating it if needed.
+
+        :param name: histogram name
+        :param value: observed value
+        :param buckets: upper bounds of the buckets if the histogram is new
+        :param spans: whether the histogram times a span
+        """
+        histograms = self.spans if spans else self.histograms
+
+        with self._lock:
+            if (histogram := histograms.get(name)) is None:
+                histogram = histograms[name] = Histogram(buckets)
+
+            histogram.observe(value)
+
+    def summary(self) -> Dict:
+        """ Returns a serializable summary of the collected metrics.
+
+        :return: dictionary of spans, counters, and histograms
+        """
+        with self._lock:
+            return {
+                'started': self.started,
+                'seconds': time.time() - self.started,
+                'spans': {name: h.to_dict() for name, h in sorted(self.spans.items())},
+                'counters': dict(sorted(self.counters.items())),
+                'histograms': {name: h.to_dict() for name, h in sorted(self.histograms.items())}
+            }
+
+
+class Span:
+    def __init__(self, name: str):
+        self.name = name
+        self.start = None
+
+    def __enter__(self) -> 'Span':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args) -> None:
+        if (registry := _registry) is not None:
+            registry.observe(self.name, time.perf_counter() - self.start, spans=True)
+
+
+class NullSpan:
+    def __enter__(self) -> 'NullSpan':
+        return self
+
+    def __exit__(self, *args) -> None:
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+def enable() -> None:
+    """ Enables instrumentation and starts collecting a new run.
+    """
+    global _registry
+    _registry = Registry()
+
+
+def disable() -> None:
+    """ Disables instrumentation and discards the collected metrics.
+    """
+    global _registry
+    _registry = None
+
+
+def enabled() -> bool:
+    """ Checks if instrumentation is enabled.
+
+    :return: True if enabled, False otherwise
+    """
+    return _registry is not None
+
+
+def span(name: str) -> Span | NullSpan:
+    """ Returns a context manager timing the block of code it wraps.
+
+    :param name: span name; e.g., 'ned_fetch'
+    :return: context manager
+    """
+    return NULL_SPAN if _registry is None else Span(name)
+
+
+def timed(name: str) -> Callable:
+    """ Decorates a function so that each call is timed as a span.
+
+    :param name: span name
+    :return: decorator
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _registry is None:
+                return func(*args, **kwargs)
+
+            with Span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def increment(name: str, value: float = 1) -> None:
+    """ Adds the value to a counter.
+
+    :param name: counter name; e.g., 'skynet_requests'
+    :param value: value to add
+    """
+    if (registry := _registry) is not None:
+        registry.increment(name, value)
+
+
+def observe(name: str, value: float, buckets: Sequence[float] = SPAN_BUCKETS) -> None:
+    """ Adds the value to a histogram.
+
+    :param name: histogram name; e.g., 'ned_download_bytes'
+    :param value: observed value
+    :param buckets: upper bounds of the buckets if the histogram is new
+    """
+    if (registry := _registry) is not None:
+        registry.observe(name, value, buckets)
+
+
+def summary() -> Dict:
+    """ Returns a serializable summary of the collected metrics.
+
+    :return: dictionary of spans, counters, and histograms; empty if
+        instrumentation is disabled
+    """
+    return {} if _registry is None else _registry.summary()
+
+
+def dump(path: str) -> None:
+    """ Writes the summary of the collected metrics to a Prometheus text
+    file if the path ends with '.prom', otherwise to a JSON file.
+
+    :param path: output path
+    """
+    content = to_prometheus(summary()) if path.endswith('.prom') else json.dumps(summary(), indent=4)
+
+    if directory := os.path.dirname(path):
+        os.makedirs(directory, exist_ok=True)
+
+    with files.atomic_write(path) as f:
+        f.write(content)
+
+
+def to_prometheus(summary: Dict) -> str:
+    """ Formats a summary in the Prometheus text exposition format.
+
+    :param summary: summary returned by summary()
+    :return: Prometheus text
+    """
+    lines = []
+
+    def histogram(metric: str, label: str, histograms: Dict) -> None:
+        if not histograms:
+            return
+
+        lines.append(f'# TYPE {metric} histogram')
+
+        for name, h in histograms.items():
+            for bound, count in h['buckets'].items():
+                lines.append(f'{metric}_bucket{{{label}="{name}",le="{bound}"}} {count}')
+
+            lines.append(f'{metric}_bucket{{{label}="{name}",le="+Inf"}} {h["count"]}')
+            lines.append(f'{metric}_sum{{{label}="{name}"}} {h["sum"]}')
+            lines.append(f'{metric}_count{{{label}="{name}"}} {h["count"]}')
+
+    histogram(f'{PREFIX}_span_seconds', 'span', summary.get('spans', {}))
+    histogram(f'{PREFIX}_histogram', 'name', summary.get('histograms', {}))
+
+    for name, value in summary.get('counters', {}).items():
+        lines.append(f'# TYPE {PREFIX}_{name}_total counter')
+        lines.append(f'{PREFIX}_{name}_total {value}')
+
+    return '\n'.join(lines) + '\n'
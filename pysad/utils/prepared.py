@@ -0,0 +1,184 @@
+import json
+import os
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Dict, List, Tuple
+
+from pysad.skynet import capabilities
+from pysad.skynet.observation import Observation
+from pysad.utils import capacity, custom, files, metrics
+from pysad.utils.string import sanitize
+
+
+"""
+    Prepared plans
+
+    Prepared plans are a cache of the event-independent work of scheduling
+    an event: the telescopes of the telescope section, their observation
+    budgets, the observation request templates of each telescope, and the
+    moon. A plan is created ahead of an alert by the prepare action so
+    that scheduling only does the event-specific work: ranking the
+    galaxies and stamping their coordinates onto the templates.
+
+    A plan is only used on the UTC date it was created and while the
+    config files and the telescope capabilities it was created from are
+    unchanged. Plans of an older format version are ignored.
+"""
+
+
+CACHE_DIRECTORY = os.path.join('pysad', 'cache', 'plans')
+
+# Format version of the plans; plans of any other version are ignored
+VERSION = 1
+
+# Files whose modification invalidates the plans
+SOURCES = ('pysad/config/observation.ini', 'pysad/config/exposures.ini', 'pysad/config/telescopes.ini',
+           capabilities.CACHE_PATH)
+
+
+def create(telescopes: List[str], tel_section: str, obs_section: str = 'Default',
+           exp_section: str = 'Default') -> Dict:
+    """ Creates the plan of the provided sections.
+
+    :param telescopes: Telescope names of the telescope section
+    :param tel_section: Telescope section config name
+    :param obs_section: Observation section config name
+    :param exp_section: Exposure section config name
+    :return: dictionary plan
+    """
+    plan = {
+        'version': VERSION,
+        'date': today(),
+        'created': time.time(),
+        'sources': source_mtimes(),
+        'sections': [tel_section, obs_section, exp_section],
+        'telescopes': telescopes,
+        'budgets': capacity.budgets(telescopes, obs_section, exp_section),
+        'templates': [
+            [telescope, section, Observation.compile_template(telescope, obs_section, section)]
+            for telescope in telescopes
+            for section in custom.RESOLVED_SECTIONS.get(exp_section, (exp_section,))
+        ],
+        'moon': None
+    }
+
+    if exp_section == '.DynamicMoon':
+        moon = custom.get_moon()
+        plan['moon'] = {'ra': float(moon.ra), 'dec': float(moon.dec), 'phase': float(moon.phase)}
+
+    return plan
+
+
+def save(plan: Dict, directory: str = CACHE_DIRECTORY) -> str:
+    """ Writes the plan to the cache directory.
+
+    :param plan: plan returned by create
+    :param directory: cache directory
+    :return: path of the plan
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    path = plan_path(*plan['sections'], directory=directory)
+
+    with files.atomic_write(path) as f:
+        f.write(json.dumps(plan))
+
+    return path
+
+
+def load(tel_section: str, obs_section: str = 'Default', exp_section: str = 'Default',
+         directory: str = CACHE_DIRECTORY) -> Dict | None:
+    """ Reads the plan of the provided sections. Returns None if there
+    is no plan or if it is outdated.
+
+    :param tel_section: Telescope section config name
+    :param obs_section: Observation section config name
+    :param exp_section: Exposure section config name
+    :param directory: cache directory
+    :return: dictionary plan or None
+    """
+    try:
+        with open(plan_path(tel_section, obs_section, exp_section, directory=directory), 'r') as f:
+            plan = json.load(f)
+    except (FileNotFoundError, ValueError):
+        plan = None
+
+    if plan is None or not is_current(plan, [tel_section, obs_section, exp_section]):
+        metrics.increment('plan_misses')
+        return None
+
+    metrics.increment('plan_hits')
+    return plan
+
+
+def is_current(plan: Dict, sections: List[str]) -> bool:
+    """ Checks if the plan was created today by the current version from
+    the current config files for the provided sections.
+
+    :param plan: plan returned by load
+    :param sections: Telescope, observation, and exposure section names
+    :return: True if the plan can be used, False otherwise
+    """
+    return (plan.get('version') == VERSION and plan.get('sections') == sections and plan.get('date') == today()
+            and plan.get('sources') == source_mtimes())
+
+
+def budgets(plan: Dict, cap: int = None) -> List[int]:
+    """ Returns the observation budget of each telescope of the plan.
+
+    :param plan: plan returned by load
+    :param cap: Max number of observations per telescope
+    :return: observation budget of each telescope
+    """
+    return [budget if cap is None else min(budget, cap) for budget in plan['budgets']]
+
+
+def templates(plan: Dict, obs_section: str = 'Default') -> Dict[Tuple[str, str, str], Dict]:
+    """ Returns the request templates of the plan keyed like the
+    templates of Observation.iter_many.
+
+    :param plan: plan returned by load
+    :param obs_section: Observation section config name
+    :return: dictionary of (telescope, section, exp_section) to template
+    """
+    return {(telescope, obs_section, section): template for telescope, section, template in plan['templates']}
+
+
+def restore_moon(plan: Dict) -> None:
+    """ Reuses the moon of the plan, if any, until it is older than
+    custom.MOON_MAX_AGE seconds.
+
+    :param plan: plan returned by load
+    """
+    if plan['moon'] is not None:
+        custom.set_moon(SimpleNamespace(**plan['moon']), plan['created'])
+
+
+def plan_path(tel_section: str, obs_section: str, exp_section: str, directory: str = CACHE_DIRECTORY) -> str:
+    """ Returns the path of the plan of the provided sections.
+
+    :param tel_section: Telescope section config name
+    :param obs_section: Observation section config name
+    :param exp_section: Exposure section config name
+    :param directory: cache directory
+    :return: path of the plan
+    """
+    return os.path.join(directory, f'{sanitize(tel_section)}_{sanitize(obs_section)}_{sanitize(exp_section)}.json')
+
+
+def source_mtimes() -> Dict[str, float | None]:
+    """ Returns the modification time of each file the plans are created
+    from.
+
+    :return: dictionary of path to modification time; None if missing
+    """
+    return {path: os.path.getmtime(path) if os.path.exists(path) else None for path in SOURCES}
+
+
+def today() -> str:
+    """ Returns the current UTC date.
+
+    :return: ISO formatted date; e.g., '2024-04-14'
+    """
+    return datetime.now(timezone.utc).date().isoformat()
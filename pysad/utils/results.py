@@ -0,0 +1,419 @@
+import contextlib
+import json
+import os
+import threading
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from pysad.utils import files, metrics
+
+
+"""
+    Results utility
+
+    Results utility is a collection of classes and methods for storing
+    and indexing the observations of an event and reconciling them
+    against the most recent list of galaxies.
+
+    Results are stored as a snapshot, 'results.json', and an append-only
+    journal, 'results.jsonl', recording every change since the snapshot.
+    Changes are journaled as soon as they happen so that a crash does not
+    lose observations that were already created on Skynet. The journal is
+    only compacted into a new snapshot once it outgrows the snapshot, so
+    writes are proportional to the number of changes.
+
+    The results of an event may be changed by several processes; e.g., a
+    watch daemon and a manual cancel. Changes are made while holding the
+    lock file of the event, after applying the changes of the others.
+"""
+
+
+# Number of journaled changes between each fsync
+JOURNAL_SYNC_EVERY = 32
+
+# Min number of journaled changes before compacting into a snapshot
+COMPACT_MIN_ENTRIES = 100
+
+
+class ResultsIndex:
+    def __init__(self, observations: List[Dict] = None):
+        self.by_id: Dict[int, Dict] = {}
+
+        # Only observations that are not canceled are indexed by name and telescope
+        self.by_name: Dict[str, Dict[int, Dict]] = {}
+        self.by_telescope: Dict[str, Dict[int, Dict]] = {}
+
+        for obs in observations or []:
+            self.add(obs)
+
+    @property
+    def observations(self) -> List[Dict]:
+        """ Returns the indexed observations in the order they were added,
+        including canceled observations.
+
+        :return: list of observations
+        """
+        return list(self.by_id.values())
+
+    def telescopes(self) -> List[str]:
+        """ Returns the telescopes with at least one live observation.
+
+        :return: list of telescope names
+        """
+        return list(self.by_telescope)
+
+    def add(self, obs: Dict) -> None:
+        """ Adds the observation to the index.
+
+        :param obs: observation with id, name, and telescope
+        """
+        self.by_id[obs['id']] = obs
+
+        if is_live(obs):
+            self.by_name.setdefault(obs['name'], {})[obs['id']] = obs
+            self.by_telescope.setdefault(obs['telescope'], {})[obs['id']] = obs
+
+    def remove(self, obs_id: int) -> Dict | None:
+        """ Removes the observation from the index.
+
+        :param obs_id: Observation ID
+        :return: the removed observation or None if it was not indexed
+        """
+        if (obs := self.by_id.pop(obs_id, None)) is None:
+            return None
+
+        self._unindex(obs)
+
+        return obs
+
+    def set_state(self, obs_id: int, state: str) -> None:
+        """ Changes the state of the observation. Canceled observations are
+        no longer indexed by name and telescope.
+
+        :param obs_id: Observation ID
+        :param state: Skynet observation state; e.g., 'canceled'
+        """
+        if (obs := self.by_id.get(obs_id)) is None:
+            return
+
+        self._unindex(obs)
+        obs['state'] = state
+        self.add(obs)
+
+    def _unindex(self, obs: Dict) -> None:
+        """ Removes the observation from the name and telescope indexes.
+
+        :param obs: indexed observation
+        """
+        for key, index in ((obs['name'], self.by_name), (obs['telescope'], self.by_telescope)):
+            if index.get(key, {}).pop(obs['id'], None) is not None and not index[key]:
+                del index[key]
+
+
+class Plan:
+    def __init__(self, keep: List[Dict] | None, cancel: Dict[str, List[int]], add: List[Dict]):
+        # Observations of galaxies that are still desired; None if not computed
+        self.keep = keep
+
+        # Observation IDs of galaxies that are no longer desired per telescope
+        self.cancel = cancel
+
+        # Desired galaxies without an observation, in ranked order
+        self.add = add
+
+    def cancel_ids(self) -> List[int]:
+        """ Returns every observation ID to cancel.
+
+        :return: list of observation IDs
+        """
+        return [obs_id for obs_ids in self.cancel.values() for obs_id in obs_ids]
+
+
+def is_live(obs: Dict) -> bool:
+    """ Checks if the observation may still be observed; i.e., it was not
+    canceled.
+
+    :param obs: observation
+    :return: True if the observation is not canceled, False otherwise
+    """
+    return obs.get('state') != 'canceled'
+
+
+def reconcile(index: ResultsIndex, galaxies: List[Dict]) -> Plan:
+    """ Computes which observations to keep and cancel, and which galaxies
+    to add, in time linear in the number of observations and galaxies.
+
+    :param index: indexed observations of the event
+    :param galaxies: desired galaxies in ranked order
+    :return: reconciliation plan
+    """
+    desired = {g['name'] for g in galaxies}
+
+    keep, cancel = [], {}
+    for obs in filter(is_live, index.by_id.values()):
+        if obs['name'] in desired:
+            keep.append(obs)
+        else:
+            cancel.setdefault(obs['telescope'], []).append(obs['id'])
+
+    add = [g for g in galaxies if g['name'] not in index.by_name]
+
+    return Plan(keep, cancel, add)
+
+
+def reconcile_delta(index: ResultsIndex, galaxies: List[Dict], left: Iterable[str]) -> Plan:
+    """ Computes which observations to cancel and which galaxies to add
+    given the galaxies that are no longer desired since the observations
+    were last reconciled. Only the observations of those galaxies are
+    visited rather than every observation, so the observations to keep
+    are not computed.
+
+    :param index: indexed observations of the event
+    :param galaxies: desired galaxies in ranked order
+    :param left: names of the galaxies that are no longer desired
+    :return: reconciliation plan
+    """
+    cancel = {}
+    for name in left:
+        for obs in index.by_name.get(name, {}).values():
+            cancel.setdefault(obs['telescope'], []).append(obs['id'])
+
+    add = [g for g in galaxies if g['name'] not in index.by_name]
+
+    return Plan(None, cancel, add)
+
+
+class ResultsStore:
+    def __init__(self, event: str, sync_every: int = JOURNAL_SYNC_EVERY):
+        self.directory = os.path.join('pysad', 'results', event)
+        self.snapshot_path = os.path.join(self.directory, 'results.json')
+        self.journal_path = os.path.join(self.directory, 'results.jsonl')
+        self.lock_path = os.path.join(self.directory, 'results.lock')
+        self.sync_every = sync_every
+
+        # Top-level snapshot fields other than the observations
+        self.meta: Dict = {}
+        self.index = ResultsIndex()
+
+        self._lock = threading.Lock()
+        self._journal = None
+        self._unsynced = 0
+
+        # Number of journaled changes since the snapshot
+        self.entries = 0
+
+        # Bytes of the journal applied and the snapshot they were applied to
+        self.offset = 0
+        self.snapshot_id = None
+
+        with files.locked(self.lock_path):
+            self.load()
+
+    def exists(self) -> bool:
+        """ Checks if there are any stored results for the event.
+
+        :return: True if a snapshot or journal exists, False otherwise
+        """
+        return os.path.exists(self.snapshot_path) or os.path.exists(self.journal_path)
+
+    @contextlib.contextmanager
+    def locked(self) -> Iterator[None]:
+        """ Holds the lock of the results of the event, excluding other
+        processes, and applies the changes they made since the results
+        were loaded. The journal is closed once the lock is released.
+        """
+        with files.locked(self.lock_path):
+            self.refresh()
+
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self.close()
+
+    def load(self) -> None:
+        """ Loads the snapshot and replays the journal on top of it. Must
+        be called with the lock file held.
+        """
+        self.meta, self.index = {}, ResultsIndex()
+        self.entries, self.offset = 0, 0
+        self.snapshot_id = self.get_snapshot_id()
+
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r') as f:
+                snapshot = json.load(f)
+
+            self.index = ResultsIndex(snapshot.pop('observations', []))
+            self.meta = snapshot
+
+        self.replay()
+
+    def refresh(self) -> None:
+        """ Applies the changes made by other processes since the results
+        were loaded. The results are loaded again if another process
+        compacted them, otherwise only the new journal entries are
+        replayed. Must be called with the lock file held.
+        """
+        with self._lock:
+            self.close()
+
+            if self.get_snapshot_id() != self.snapshot_id:
+                self.load()
+            else:
+                self.replay()
+
+    def replay(self) -> None:
+        """ Applies the journal entries after the applied offset. A
+        partially written final journal entry is truncated. Must be called
+        with the lock file held.
+        """
+        if not os.path.exists(self.journal_path):
+            self.offset = 0
+            return
+
+        with open(self.journal_path, 'rb+') as f:
+            f.seek(self.offset)
+
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # Interrupted while writing the last entry
+
+                try:
+                    self.apply(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+
+                self.offset += len(line)
+                self.entries += 1
+
+            f.truncate(self.offset)
+
+    def get_snapshot_id(self) -> Tuple[int, int] | None:
+        """ Returns what identifies the current snapshot, which changes
+        every time it is compacted.
+
+        :return: inode and modification time of the snapshot or None
+        """
+        try:
+            stat = os.stat(self.snapshot_path)
+        except FileNotFoundError:
+            return None
+
+        return stat.st_ino, stat.st_mtime_ns
+
+    def apply(self, entry: Dict) -> None:
+        """ Applies a journal entry to the in-memory results.
+
+        :param entry: journal entry
+        """
+        if entry['op'] == 'add':
+            self.index.add(entry['obs'])
+        elif entry['op'] == 'remove':
+            self.index.remove(entry['id'])
+        elif entry['op'] == 'state':
+            self.index.set_state(entry['id'], entry['state'])
+        elif entry['op'] == 'meta':
+            self.meta[entry['key']] = entry['value']
+
+    def add(self, obs: Dict) -> None:
+        """ Records a new observation.
+
+        :param obs: observation with id, state, name, and telescope
+        """
+        self.record({'op': 'add', 'obs': obs})
+
+    def remove(self, obs_id: int) -> None:
+        """ Records that the observation is no longer managed.
+
+        :param obs_id: Observation ID
+        """
+        self.record({'op': 'remove', 'id': obs_id})
+
+    def set_state(self, obs_id: int, state: str) -> None:
+        """ Records a new state of the observation.
+
+        :param obs_id: Observation ID
+        :param state: Skynet observation state; e.g., 'canceled'
+        """
+        self.record({'op': 'state', 'id': obs_id, 'state': state})
+
+    def set_meta(self, key: str, value) -> None:
+        """ Records a top-level field of the results; e.g., whether the
+        event was completely scheduled.
+
+        :param key: field name
+        :param value: JSON serializable value
+        """
+        self.record({'op': 'meta', 'key': key, 'value': value})
+
+    def record(self, entry: Dict) -> None:
+        """ Appends the entry to the journal and applies it. The journal is
+        fsynced every sync_every entries. Safe to call from multiple
+        threads.
+
+        :param entry: journal entry
+        """
+        with self._lock:
+            if self._journal is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._journal = open(self.journal_path, 'a', newline='\n')
+
+            line = json.dumps(entry) + '\n'
+
+            self._journal.write(line)
+            self._journal.flush()
+
+            metrics.increment('results_journaled')
+
+            self.apply(entry)
+            self.entries += 1
+            self.offset += len(line)
+            self._unsynced += 1
+
+            if self._unsynced >= self.sync_every:
+                self.sync()
+
+    def sync(self) -> None:
+        """ Forces the journaled entries to disk.
+        """
+        if self._journal is not None:
+            with metrics.span('results_fsync'):
+                os.fsync(self._journal.fileno())
+
+            self._unsynced = 0
+
+    def checkpoint(self) -> None:
+        """ Syncs the journal and compacts it into a new snapshot if it has
+        more entries than the snapshot has observations.
+        """
+        with self._lock:
+            self.close()
+
+        if self.entries >= max(COMPACT_MIN_ENTRIES, len(self.index.by_id)):
+            self.compact()
+
+    @metrics.timed('results_compact')
+    def compact(self) -> None:
+        """ Writes the current results as a new snapshot and removes the
+        journal.
+        """
+        with self._lock:
+            self.close()
+
+            os.makedirs(self.directory, exist_ok=True)
+
+            with files.atomic_write(self.snapshot_path, sync=True) as f:
+                f.write(json.dumps({**self.meta, 'observations': self.index.observations}, indent=4))
+
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+
+            self.entries, self.offset = 0, 0
+            self.snapshot_id = self.get_snapshot_id()
+
+    def close(self) -> None:
+        """ Syncs and closes the journal.
+        """
+        if self._journal is not None:
+            self.sync()
+            self._journal.close()
+            self._journal = None
@@ -0,0 +1,142 @@
+import hashlib
+from types import CodeType
+from typing import Callable, Dict, List, Tuple
+
+import numpy
+
+from pysad.utils import config, metrics
+
+
+"""
+    Scoring utility
+
+    Scoring utility ranks galaxies under a scoring profile defined in
+    'pysad/config/scoring.ini'. A profile is made of one or more terms
+    and the score of a galaxy is the sum of the terms. Each term is an
+    expression evaluated over whole columns of the galaxy list at once;
+    e.g., 'P_3D * P_LumW1' or '0.2 * exp(-DistMpc / 100)'. Expressions
+    may use the numpy functions in FUNCTIONS and Python callables
+    registered with register, which take and return columns.
+"""
+
+
+PROFILES_PATH = 'pysad/config/scoring.ini'
+
+# Numpy functions available to the expressions of the terms
+FUNCTIONS = {name: getattr(numpy, name) for name in (
+    'abs', 'clip', 'exp', 'fmod', 'isin', 'isnan', 'log', 'log10', 'maximum', 'minimum', 'sqrt', 'where'
+)}
+
+# Python callables registered by name; e.g., a penalty for galaxies already imaged
+_callables: Dict[str, Callable] = {}
+
+
+class Profile:
+    def __init__(self, name: str, terms: Dict[str, str]):
+        self.name = name
+
+        # Term name, expression, and compiled expression of each term
+        self.terms: List[Tuple[str, str, CodeType]] = [
+            (term, expression, compile(expression, f'{PROFILES_PATH}[{name}].{term}', 'eval'))
+            for term, expression in terms.items()
+        ]
+
+    @property
+    def digest(self) -> str:
+        """ Returns a digest of the terms, which identifies the scores of
+        the profile.
+
+        :return: hexadecimal digest
+        """
+        terms = '\n'.join(f'{term}={expression}' for term, expression, _ in self.terms)
+        return hashlib.sha256(terms.encode()).hexdigest()[:16]
+
+    @property
+    def names(self) -> set:
+        """ Returns the names of the columns, functions, and callables used
+        by the terms.
+
+        :return: set of names
+        """
+        return {name for *_, code in self.terms for name in code.co_names}
+
+    @property
+    def cacheable(self) -> bool:
+        """ Checks if the scores of the profile only depend on the galaxy
+        list. Registered callables may depend on other state, e.g., the
+        galaxies already imaged, so their scores are never cached.
+
+        :return: True if the scores can be cached, False otherwise
+        """
+        return not self.names & set(_callables)
+
+
+def register(name: str, func: Callable = None) -> Callable:
+    """ Registers a Python callable that can be called by name in the
+    expressions of the terms. Can be used as a decorator.
+
+    :param name: name used in the expressions
+    :param func: callable taking and returning columns
+    :return: the callable, or a decorator if func is not provided
+    """
+    if func is None:
+        return lambda f: register(name, f)
+
+    _callables[name] = func
+    return func
+
+
+def get_profile(name: str) -> Profile:
+    """ Returns the scoring profile of the provided section. Throws a
+    ValueError if the section does not exist or has no terms.
+
+    :param name: Scoring section config name
+    :return: Profile
+    """
+    if not (terms := config.load(PROFILES_PATH, typed=False).get(name)):
+        raise ValueError(f'Scoring config file is missing the {name} profile.')
+
+    return Profile(name, dict(terms))
+
+
+@metrics.timed('galaxies_score')
+def evaluate(columns: numpy.ndarray, profile: Profile) -> numpy.ndarray:
+    """ Computes the score of every galaxy under the profile. Galaxies
+    with a NaN score, e.g., because of a missing value, are scored zero.
+
+    :param columns: structured array of the galaxy list
+    :param profile: scoring profile
+    :return: array of scores
+    """
+    namespace = {**FUNCTIONS, **_callables}
+    namespace.update({name: columns[name] for name in profile.names if name in columns.dtype.names})
+
+    scores = numpy.zeros(len(columns))
+    for term, _, code in profile.terms:
+        try:
+            scores += eval(code, {'__builtins__': {}}, namespace)
+        except NameError as e:
+            raise ValueError(f'Scoring profile {profile.name} term {term}: {e}') from e
+
+    return numpy.where(numpy.isnan(scores), 0., scores)
+
+
+def rank(scores: numpy.ndarray, start: int = None, stop: int = None) -> numpy.ndarray:
+    """ Returns the indices of the galaxies ranked by descending score.
+    Only the galaxies up to stop are sorted, so ranking the top of a
+    long list is linear in its length. Ties keep the order of the list.
+
+    :param scores: array of scores
+    :param start: Starting rank to return
+    :param stop: Rank to stop before
+    :return: array of indices
+    """
+    stop = len(scores) if stop is None else min(stop, len(scores))
+
+    # Every galaxy scored at least as high as the galaxy ranked stop
+    if 0 < stop < len(scores):
+        top = numpy.flatnonzero(scores >= numpy.partition(scores, len(scores) - stop)[len(scores) - stop])
+    else:
+        top = numpy.arange(stop)
+
+    return top[numpy.lexsort((top, -scores[top]))][start:stop]
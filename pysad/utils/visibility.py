@@ -0,0 +1,181 @@
+from datetime import datetime, timezone
+from typing import List, Sequence
+
+import numpy
+
+from pysad.utils import config
+
+
+"""
+    Visibility utility
+
+    Visibility utility is a collection of methods for determining how
+    long each galaxy can be observed from each telescope site. Galaxy
+    and sun altitudes are computed for every site over a grid of times
+    at once using low precision formulae that are accurate to well
+    within the size of a time step.
+"""
+
+
+# Length in hours of the observing window starting now
+WINDOW_HOURS = 24.
+
+# Length in minutes of each step of the time grid
+STEP_MINUTES = 10.
+
+# Number of galaxies whose altitudes are computed at once
+CHUNK_SIZE = 1024
+
+
+def observable_hours(ra_hours: Sequence[float], dec_degs: Sequence[float], telescopes: List[str],
+                     section: str = 'Default', start: datetime = None) -> numpy.ndarray:
+    """ Computes how many hours each galaxy is above the minimum elevation
+    while the sun is below the maximum sun elevation at each telescope
+    over the next WINDOW_HOURS hours. The observing constraints are read
+    from the observation config section. Telescopes without a site in
+    the telescopes config can observe every galaxy for an infinite
+    number of hours.
+
+    :param ra_hours: Right ascensions in hours
+    :param dec_degs: Declinations in degrees
+    :param telescopes: Telescope names
+    :param section: Observation section config name
+    :param start: Start of the observing window; defaults to now
+    :return: (galaxies, telescopes) array of observable hours
+    """
+    min_el = config.value(config.load('pysad/config/observation.ini'), section, 'min_el')
+
+    lat, lst, dark = site_grid(telescopes, section, start)
+
+    ra = numpy.radians(numpy.asarray(ra_hours, dtype=float) * 15.)
+    dec = numpy.radians(numpy.asarray(dec_degs, dtype=float))
+
+    hours = numpy.empty((len(ra), len(telescopes)))
+    for i in range(0, len(ra), CHUNK_SIZE):
+        chunk = slice(i, i + CHUNK_SIZE)
+
+        # (galaxies, sites, times) array of galaxy altitudes
+        alt = altitude(lat[None, :, None], dec[chunk, None, None], lst[None, :, :] - ra[chunk, None, None])
+
+        hours[chunk] = ((alt >= numpy.radians(min_el)) & dark[None, :, :]).sum(axis=-1) * STEP_MINUTES / 60.
+
+    hours[:, numpy.isnan(lat)] = numpy.inf
+
+    return hours
+
+
+def dark_hours(telescopes: List[str], section: str = 'Default', start: datetime = None) -> numpy.ndarray:
+    """ Computes how many hours the sun is below the maximum sun elevation
+    at each telescope over the next WINDOW_HOURS hours.
+
+    :param telescopes: Telescope names
+    :param section: Observation section config name
+    :param start: Start of the observing window; defaults to now
+    :return: array of dark hours; NaN for telescopes without a site
+    """
+    lat, _, dark = site_grid(telescopes, section, start)
+
+    return numpy.where(numpy.isnan(lat), numpy.nan, dark.sum(axis=-1) * STEP_MINUTES / 60.)
+
+
+def site_grid(telescopes: List[str], section: str = 'Default',
+              start: datetime = None) -> (numpy.ndarray, numpy.ndarray, numpy.ndarray):
+    """ Computes the local sidereal time of each telescope site over the
+    time grid and whether the sun is below the maximum sun elevation.
+
+    :param telescopes: Telescope names
+    :param section: Observation section config name
+    :param start: Start of the observing window; defaults to now
+    :return: tuple of latitudes in radians, and (sites, times) arrays of
+        local sidereal times in radians and whether it is dark
+    """
+    max_sun = config.value(config.load('pysad/config/observation.ini'), section, 'max_sun')
+
+    lat, lon = get_sites(telescopes)
+    jd = time_grid(start)
+
+    lat = numpy.radians(lat)
+
+    # Local sidereal time in radians of each site at each time
+    lst = numpy.radians(gmst_degs(jd)[None, :] + numpy.nan_to_num(lon)[:, None])
+
+    # Whether the sun is low enough at each site at each time
+    sun_ra, sun_dec = sun_position(jd)
+    dark = altitude(lat[:, None], sun_dec[None, :], lst - sun_ra[None, :]) <= numpy.radians(max_sun)
+
+    return lat, lst, dark
+
+
+def get_sites(telescopes: List[str]) -> (numpy.ndarray, numpy.ndarray):
+    """ Returns the latitude and longitude of each telescope from the
+    telescopes config file. Telescopes without a site are NaN.
+
+    :param telescopes: Telescope names
+    :return: tuple of latitudes and longitudes in degrees
+    """
+    settings = config.load('pysad/config/telescopes.ini')
+
+    lat, lon = [], []
+    for telescope in telescopes:
+        site = settings.get(telescope.upper(), config.EMPTY)
+        lat.append(site.get('latitude', numpy.nan))
+        lon.append(site.get('longitude', numpy.nan))
+
+    return numpy.asarray(lat, dtype=float), numpy.asarray(lon, dtype=float)
+
+
+def time_grid(start: datetime = None) -> numpy.ndarray:
+    """ Returns the Julian dates of the observing window time grid.
+
+    :param start: Start of the observing window; defaults to now
+    :return: array of Julian dates
+    """
+    start = start or datetime.now(timezone.utc)
+
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+
+    jd = start.timestamp() / 86400. + 2440587.5
+
+    return jd + numpy.arange(0., WINDOW_HOURS * 60., STEP_MINUTES) / 1440.
+
+
+def gmst_degs(jd: numpy.ndarray) -> numpy.ndarray:
+    """ Returns the Greenwich mean sidereal time.
+
+    :param jd: Julian dates
+    :return: sidereal times in degrees
+    """
+    return (280.46061837 + 360.98564736629 * (jd - 2451545.)) % 360.
+
+
+def sun_position(jd: numpy.ndarray) -> (numpy.ndarray, numpy.ndarray):
+    """ Returns the apparent right ascension and declination of the sun
+    using the low precision formulae of the Astronomical Almanac.
+
+    :param jd: Julian dates
+    :return: tuple of right ascensions and declinations in radians
+    """
+    n = jd - 2451545.
+
+    mean_lon = numpy.radians(280.460 + 0.9856474 * n)
+    anomaly = numpy.radians(357.528 + 0.9856003 * n)
+    ecl_lon = mean_lon + numpy.radians(1.915 * numpy.sin(anomaly) + 0.020 * numpy.sin(2 * anomaly))
+    obliquity = numpy.radians(23.439 - 0.0000004 * n)
+
+    ra = numpy.arctan2(numpy.cos(obliquity) * numpy.sin(ecl_lon), numpy.cos(ecl_lon))
+    dec = numpy.arcsin(numpy.sin(obliquity) * numpy.sin(ecl_lon))
+
+    return ra, dec
+
+
+def altitude(lat, dec, hour_angle):
+    """ Returns the altitude of a target. Arguments are broadcast
+    together.
+
+    :param lat: Site latitudes in radians
+    :param dec: Target declinations in radians
+    :param hour_angle: Target hour angles in radians
+    :return: altitudes in radians
+    """
+    return numpy.arcsin(numpy.sin(lat) * numpy.sin(dec) + numpy.cos(lat) * numpy.cos(dec) * numpy.cos(hour_angle))
@@ -0,0 +1,19 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+
+# Configs of the repo copied into each test workspace
+CONFIG_DIRECTORY = Path(__file__).resolve().parents[1] / 'pysad' / 'config'
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """ Runs the test from an empty working directory with a copy of the
+    configs, since pysad reads and writes paths relative to it.
+    """
+    shutil.copytree(CONFIG_DIRECTORY, tmp_path / 'pysad' / 'config')
+    monkeypatch.chdir(tmp_path)
+
+    return tmp_path
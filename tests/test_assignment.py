@@ -0,0 +1,66 @@
+import numpy
+
+from pysad.utils.assignment import SkyIndex, assign, interleave, tour, unit_vectors
+
+
+def galaxy(name: str, ra_hours: float, dec_degs: float) -> dict:
+    return {'name': name, 'ra_hours': ra_hours, 'dec_degs': dec_degs}
+
+
+# Ranked galaxies alternating between a cluster north of the celestial
+# equator and one south of it, on either side of 0h right ascension
+GALAXIES = [
+    galaxy('N0', 23.9, 30.), galaxy('S0', 12., -40.),
+    galaxy('N1', .1, 31.), galaxy('S1', 12.2, -41.),
+    galaxy('N2', .3, 29.), galaxy('S2', 11.8, -42.),
+]
+
+
+def names(group: list) -> list:
+    return [g['name'] for g in group]
+
+
+def test_nearest_wraps_around_right_ascension():
+    index = SkyIndex([g['ra_hours'] for g in GALAXIES], [g['dec_degs'] for g in GALAXIES])
+
+    assert index.first() == 0
+    assert index.nearest(0, 3).tolist() == [0, 2, 4]
+
+    index.take([0, 2])
+    assert len(index) == 4
+    assert index.first() == 1
+    assert index.nearest(0, 1).tolist() == [4]
+
+    allowed = numpy.array([True, False, True, False, True, True])
+    assert index.nearest(5, 5, allowed).tolist() == [5, 4]
+
+
+def test_each_telescope_observes_a_cluster():
+    groups = assign(['T1', 'T2'], GALAXIES, capacity=3)
+
+    assert [sorted(names(group)) for group in groups] == [['N0', 'N1', 'N2'], ['S0', 'S1', 'S2']]
+    assert names(groups[0])[0] == 'N0' and names(groups[1])[0] == 'S0'
+
+
+def test_clusters_are_observable():
+    # T1 cannot observe the north cluster, and nobody can observe S2
+    hours = numpy.ones((6, 2))
+    hours[[0, 2, 4], 0] = 0.
+    hours[5] = 0.
+
+    groups = assign(['T1', 'T2'], GALAXIES, capacity=[3, 2], hours=hours)
+
+    assert groups == [[GALAXIES[1], GALAXIES[3]], [GALAXIES[0], GALAXIES[2]]]
+
+
+def test_tour_visits_the_nearest_galaxy_next():
+    vectors = unit_vectors([0., 3., 1., 2.], [0., 0., 0., 0.])
+
+    assert tour(vectors, [0, 1, 2, 3]) == [0, 2, 3, 1]
+
+
+def test_interleave_starts_with_every_seed():
+    telescopes, groups = interleave(['T1', 'T2'], [GALAXIES[:3], GALAXIES[3:4]])
+
+    assert telescopes == ['T1', 'T2', 'T1', 'T1']
+    assert groups == [[GALAXIES[0]], [GALAXIES[3]], [GALAXIES[1]], [GALAXIES[2]]]
@@ -0,0 +1,36 @@
+import numpy
+import pytest
+
+from pysad.utils import capacity
+from pysad.utils.results import ResultsIndex
+
+
+TELESCOPES = ['Morehead', 'RRRT']
+
+
+@pytest.fixture
+def dark_hours(workspace, monkeypatch):
+    """ Morehead is dark for 4 hours, and the site of RRRT is unknown. """
+    monkeypatch.setattr(capacity.visibility, 'dark_hours', lambda *_: numpy.array([4., numpy.nan]))
+
+
+def test_observation_seconds(workspace):
+    # A 300 s exposure with 60 s of overhead
+    assert capacity.observation_seconds('Morehead', overhead=60.) == 360.
+
+    # The longest of the dark and bright moon exposures, 10 x 160 s each
+    assert capacity.observation_seconds('Morehead', '.DynamicMoon', overhead=60.) == 2200.
+
+
+def test_budgets_fill_the_dark_hours(dark_hours):
+    # Telescopes without a known site are dark for the configured 8 hours
+    assert capacity.budgets(TELESCOPES) == [40, 80]
+    assert capacity.budgets(TELESCOPES, cap=50) == [40, 50]
+    assert capacity.budgets(TELESCOPES, exp_section='.DynamicMoon') == [6, 13]
+
+
+def test_queue_space_excludes_queued_observations():
+    index = ResultsIndex([{'id': i, 'state': 'active', 'name': f'G{i}', 'telescope': 'Morehead'} for i in range(3)])
+
+    assert capacity.queue_space(TELESCOPES, [5, 5], index) == [2, 5]
+    assert capacity.queue_space(TELESCOPES, [2, 0], index) == [0, 0]
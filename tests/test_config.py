@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+from pysad.utils import config
+
+
+def write(path, text: str, mtime_ns: int) -> str:
+    """ Writes the config file with an explicit modification time, since
+    writes within the same clock tick share one. """
+    path.write_text(text)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    return str(path)
+
+
+def test_snapshot_is_parsed_once_until_the_file_changes(tmp_path):
+    path = write(tmp_path / 'exposures.ini', '[Default]\nexp_length = 300\nfilters = R, V\n', 10 ** 18)
+
+    settings = config.load(path)
+    assert config.load(path) is settings
+    assert settings['Default'] == {'exp_length': 300, 'filters': ('R', 'V')}
+    assert config.load(path, typed=False)['Default']['exp_length'] == '300'
+
+    with pytest.raises(TypeError):
+        settings['Default']['exp_length'] = 60
+
+    write(tmp_path / 'exposures.ini', '[Default]\nexp_length = 60\n', 10 ** 18 + 1)
+
+    assert config.load(path) is not settings
+    assert config.load(path)['Default'] == {'exp_length': 60}
+
+
+def test_missing_file_is_empty_until_created(tmp_path):
+    path = str(tmp_path / 'telescopes.ini')
+
+    assert config.load(path) == {}
+
+    write(tmp_path / 'telescopes.ini', '[API]\ntimeout = 30\n', 10 ** 18)
+
+    assert config.value(config.load(path), 'API', 'timeout') == 30
+
+
+def test_sections_merge_by_priority(tmp_path):
+    path = write(tmp_path / 'exposures.ini', '[Default]\nexp_length = 300\nrepeat = 1\n\n'
+                                             '[MOREHEAD]\nexp_length = 120\nrepeat =\n', 10 ** 18)
+
+    merged = config.section(path, 'MOREHEAD', 'Default')
+    assert merged == {'exp_length': 120, 'repeat': 1}
+    assert config.section(path, 'MOREHEAD', 'Default') is merged
+
+    write(tmp_path / 'exposures.ini', '[Default]\nexp_length = 300\nrepeat = 2\n', 10 ** 18 + 1)
+
+    assert config.section(path, 'MOREHEAD', 'Default') == {'exp_length': 300, 'repeat': 2}
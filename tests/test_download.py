@@ -0,0 +1,110 @@
+import os
+
+import pytest
+
+from pysad.utils import download
+
+
+class Response:
+    def __init__(self, status_code: int, content: bytes = b'', etag: str = None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {'ETag': etag} if etag else {}
+        self.text = content.decode()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+    def iter_content(self, chunk_size: int):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+
+class StandInNED:
+    """ Serves the content of each URL with its digest as the ETag. """
+    def __init__(self, contents: dict):
+        self.contents = contents
+        self.requests = []
+
+    def get(self, url: str, headers: dict, stream: bool, timeout: tuple) -> Response:
+        self.requests.append((url, headers, timeout))
+
+        etag = f'"{hash(self.contents[url])}"'
+        if headers.get('If-None-Match') == etag:
+            return Response(304)
+
+        return Response(200, self.contents[url], etag)
+
+
+@pytest.fixture
+def ned(monkeypatch):
+    def install(contents: dict) -> StandInNED:
+        server = StandInNED(contents)
+        monkeypatch.setattr(download, 'get_session', lambda: server)
+        return server
+
+    return install
+
+
+def read(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_unchanged_content_is_revalidated(tmp_path, ned):
+    server = ned({'a': b'name,ra,dec\n'})
+
+    path = download.fetch('a', str(tmp_path))
+    assert download.fetch('a', str(tmp_path)) == path
+    assert read(path) == b'name,ra,dec\n'
+
+    (_, first, timeout), (_, second, _) = server.requests
+    assert first == {} and 'If-None-Match' in second
+    assert timeout == download.TIMEOUT
+
+    # Changed content is downloaded again under its new digest
+    server.contents['a'] = b'name,ra,dec\nG0,1,2\n'
+    assert read(download.fetch('a', str(tmp_path))) == b'name,ra,dec\nG0,1,2\n'
+
+
+def test_least_recently_used_content_is_evicted(tmp_path, ned):
+    ned({url: url.encode() * 10 for url in 'abc'})
+
+    a = download.fetch('a', str(tmp_path), max_bytes=20)
+    b = download.fetch('b', str(tmp_path), max_bytes=20)
+
+    # Using a again makes b the least recently used
+    download.fetch('a', str(tmp_path), max_bytes=20)
+    c = download.fetch('c', str(tmp_path), max_bytes=20)
+
+    assert os.path.exists(a) and os.path.exists(c)
+    assert not os.path.exists(b)
+    assert sorted(download.read_index(str(tmp_path))['urls']) == ['a', 'c']
+
+
+def test_evicted_content_is_downloaded_again(tmp_path, ned):
+    server = ned({'a': b'name,ra,dec\n'})
+
+    path = download.fetch('a', str(tmp_path))
+    os.remove(path)
+
+    assert download.fetch('a', str(tmp_path)) == path
+    assert 'If-None-Match' not in server.requests[-1][1]
+
+
+def test_failed_download_leaves_no_partial_content(tmp_path, ned, monkeypatch):
+    ned({'a': b'name,ra,dec\n'})
+
+    def iter_content(self, chunk_size: int):
+        yield b'name,'
+        raise ConnectionError('Connection reset')
+
+    monkeypatch.setattr(Response, 'iter_content', iter_content)
+
+    with pytest.raises(ConnectionError):
+        download.fetch('a', str(tmp_path))
+
+    assert sorted(os.listdir(tmp_path)) == ['index.json.lock']
@@ -0,0 +1,162 @@
+import json
+import os
+
+from pysad.utils import capacity, results
+from pysad.utils.results import ResultsStore, reconcile, reconcile_delta
+
+
+EVENT = 'S240101a'
+
+
+def test_changes_of_other_processes_survive_compaction(workspace, monkeypatch):
+    monkeypatch.setattr(results, 'COMPACT_MIN_ENTRIES', 0)
+
+    daemon = ResultsStore(EVENT)
+    with daemon.locked():
+        for obs_id in range(3):
+            daemon.add({'id': obs_id, 'state': 'active', 'name': f'G{obs_id}', 'telescope': 'T1'})
+
+    # A manual run in another process
+    manual = ResultsStore(EVENT)
+    with manual.locked():
+        manual.set_state(1, 'canceled')
+        manual.add({'id': 3, 'state': 'active', 'name': 'G3', 'telescope': 'T1'})
+
+    with daemon.locked():
+        daemon.checkpoint()
+
+    stored = ResultsStore(EVENT)
+    assert sorted(stored.index.by_id) == [0, 1, 2, 3]
+    assert stored.index.by_id[1]['state'] == 'canceled'
+
+
+def test_compaction_by_another_process_is_loaded(workspace, monkeypatch):
+    monkeypatch.setattr(results, 'COMPACT_MIN_ENTRIES', 0)
+
+    daemon = ResultsStore(EVENT)
+    with daemon.locked():
+        daemon.add({'id': 0, 'state': 'active', 'name': 'G0', 'telescope': 'T1'})
+
+    manual = ResultsStore(EVENT)
+    with manual.locked():
+        manual.add({'id': 1, 'state': 'active', 'name': 'G1', 'telescope': 'T1'})
+        manual.checkpoint()
+
+    with daemon.locked():
+        assert sorted(daemon.index.by_id) == [0, 1]
+
+        daemon.add({'id': 2, 'state': 'active', 'name': 'G2', 'telescope': 'T1'})
+
+    assert sorted(ResultsStore(EVENT).index.by_id) == [0, 1, 2]
+
+
+def test_canceled_observations_are_not_live(workspace):
+    store = ResultsStore(EVENT)
+    with store.locked():
+        for obs_id in range(3):
+            store.add({'id': obs_id, 'state': 'active', 'name': f'G{obs_id}', 'telescope': 'T1'})
+
+        store.set_state(1, 'canceled')
+
+    desired = [{'name': 'G0'}, {'name': 'G1'}]
+
+    for index in (store.index, ResultsStore(EVENT).index):
+        assert [obs['id'] for obs in index.observations] == [0, 1, 2]
+        assert 'G1' not in index.by_name
+
+        plan = reconcile(index, desired)
+        assert [obs['id'] for obs in plan.keep] == [0]
+        assert plan.cancel == {'T1': [2]}
+        assert plan.add == [{'name': 'G1'}]
+
+        plan = reconcile_delta(index, desired, left=['G1', 'G2'])
+        assert plan.cancel == {'T1': [2]}
+        assert plan.add == [{'name': 'G1'}]
+
+        assert capacity.queue_space(['T1'], [3], index) == [1]
+
+
+def test_journal_is_replayed_without_compaction(workspace):
+    store = ResultsStore(EVENT)
+    with store.locked():
+        for obs_id in range(3):
+            store.add({'id': obs_id, 'state': 'active', 'name': f'G{obs_id}', 'telescope': 'T1'})
+
+        store.remove(0)
+        store.set_meta('scheduled', True)
+
+    assert not os.path.exists(store.snapshot_path)
+
+    stored = ResultsStore(EVENT)
+    assert stored.index.observations == store.index.observations
+    assert stored.meta == {'scheduled': True}
+    assert stored.entries == 5
+
+
+def test_partial_journal_entry_is_truncated_on_replay(workspace):
+    store = ResultsStore(EVENT)
+    with store.locked():
+        store.add({'id': 0, 'state': 'active', 'name': 'G0', 'telescope': 'T1'})
+
+    # Interrupted while journaling the next observation
+    with open(store.journal_path, 'a') as f:
+        f.write('{"op": "add", "obs": {"id": 1, "sta')
+
+    stored = ResultsStore(EVENT)
+    assert list(stored.index.by_id) == [0]
+
+    with stored.locked():
+        stored.add({'id': 2, 'state': 'active', 'name': 'G2', 'telescope': 'T1'})
+
+    with open(store.journal_path) as f:
+        assert [json.loads(line)['obs']['id'] for line in f] == [0, 2]
+
+    assert list(ResultsStore(EVENT).index.by_id) == [0, 2]
+
+
+def observed_index() -> results.ResultsIndex:
+    """ G0 and G1 are observed by two telescopes, G2 and G3 by one. """
+    return results.ResultsIndex([
+        {'id': 0, 'state': 'active', 'name': 'G0', 'telescope': 'T1'},
+        {'id': 1, 'state': 'active', 'name': 'G0', 'telescope': 'T2'},
+        {'id': 2, 'state': 'active', 'name': 'G1', 'telescope': 'T1'},
+        {'id': 3, 'state': 'active', 'name': 'G1', 'telescope': 'T2'},
+        {'id': 4, 'state': 'active', 'name': 'G2', 'telescope': 'T1'},
+        {'id': 5, 'state': 'active', 'name': 'G3', 'telescope': 'T2'},
+    ])
+
+
+def test_reconcile_plans_every_observation():
+    desired = [{'name': 'G4'}, {'name': 'G1'}, {'name': 'G5'}, {'name': 'G2'}]
+
+    plan = reconcile(observed_index(), desired)
+
+    assert [obs['id'] for obs in plan.keep] == [2, 3, 4]
+    assert plan.cancel == {'T1': [0], 'T2': [1, 5]}
+    assert sorted(plan.cancel_ids()) == [0, 1, 5]
+    assert plan.add == [{'name': 'G4'}, {'name': 'G5'}]
+
+
+def test_reconcile_delta_matches_reconcile():
+    index = observed_index()
+    desired = [{'name': 'G4'}, {'name': 'G1'}, {'name': 'G5'}, {'name': 'G2'}]
+
+    # G6 was desired before but never observed
+    plan = reconcile_delta(index, desired, left=['G0', 'G3', 'G6'])
+    expected = reconcile(index, desired)
+
+    assert plan.keep is None
+    assert plan.cancel == expected.cancel
+    assert plan.add == expected.add
+
+
+def test_nothing_to_reconcile():
+    index = observed_index()
+    desired = [{'name': name} for name in ('G0', 'G1', 'G2', 'G3')]
+
+    plan = reconcile(index, desired)
+    assert len(plan.keep) == 6
+    assert not plan.cancel_ids() and not plan.add
+
+    plan = reconcile_delta(index, desired, left=[])
+    assert not plan.cancel_ids() and not plan.add
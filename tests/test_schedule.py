@@ -0,0 +1,105 @@
+import itertools
+
+import numpy
+import pytest
+
+from pysad.actions import schedule
+from pysad.utils.galaxies import GalaxyDB
+from pysad.utils.results import ResultsStore
+
+
+EVENT = 'S240101a'
+
+TELESCOPES = ['Morehead', 'RRRT']
+
+
+class Crash(Exception):
+    pass
+
+
+class StandInSkynet:
+    # Observation IDs are unique across runs like on Skynet
+    ids = itertools.count(1)
+
+    def __init__(self, crash_after: int = None, rejected: set = ()):
+        self.submitted = []
+        self.crash_after = crash_after
+        self.rejected = rejected
+
+    def add_observation(self, **kwargs) -> dict:
+        if len(self.submitted) == self.crash_after:
+            raise Crash()
+
+        if kwargs['name'] in self.rejected:
+            raise RuntimeError(f'{kwargs["name"]} was rejected.')
+
+        self.submitted.append((kwargs['name'], kwargs['telescopes']))
+        return {'id': next(self.ids), 'name': kwargs['name']}
+
+
+def run(workspace, **kwargs) -> int:
+    """ Schedules a galaxy list of 16 galaxies on two telescopes that can
+    each observe 4. """
+    path = workspace / 'revision1'
+    path.write_text('name,ra,dec,P_3D,P_LumW1\n' + ''.join(
+        f'G{i},{7.5 * i},{30. - i},{(16 - i) / 16},1\n' for i in range(16)
+    ))
+
+    galaxy_db = GalaxyDB(EVENT)
+    galaxy_db.save_to_disk(str(path))
+
+    return schedule.execute(event=EVENT, obs_section='Default', exp_section='Default', tel_section='Default',
+                            telescopes=TELESCOPES, capacity=[4, 4], galaxy_db=galaxy_db, plan=None,
+                            max_workers=1, **kwargs)
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    def install(skynet: StandInSkynet, hours: numpy.ndarray) -> StandInSkynet:
+        monkeypatch.setattr(schedule.api, 'add_observation', skynet.add_observation)
+        monkeypatch.setattr(schedule.visibility, 'observable_hours', lambda ra, dec, *_: hours[:len(ra)])
+        return skynet
+
+    return install
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_resume_does_not_observe_galaxies_twice(workspace, stand_in, stream):
+    visible = numpy.ones((16, len(TELESCOPES)))
+
+    with pytest.raises(Crash):
+        stand_in(StandInSkynet(crash_after=3), visible)
+        run(workspace, stream=stream)
+
+    store = ResultsStore(EVENT)
+    assert len(store.index.by_id) == 3
+    assert not schedule.is_scheduled(store)
+
+    crashed = {t: len(obs) for t, obs in store.index.by_telescope.items()}
+
+    # Hours later, the first telescope cannot observe any galaxy, so the
+    # galaxies it observes would be assigned to the second telescope
+    hidden = visible.copy()
+    hidden[:, 0] = 0.
+
+    skynet = stand_in(StandInSkynet(), hidden)
+    assert run(workspace, stream=stream) == 0
+
+    store = ResultsStore(EVENT)
+    names = [obs['name'] for obs in store.index.observations]
+
+    assert len(names) == len(set(names)) == crashed['Morehead'] + 4
+    assert {t: len(obs) for t, obs in store.index.by_telescope.items()} == {'Morehead': crashed['Morehead'], 'RRRT': 4}
+    assert all(telescope == 'RRRT' for _, telescope in skynet.submitted)
+    assert schedule.is_scheduled(store)
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_failed_submission_fails_the_run(workspace, stand_in, stream):
+    stand_in(StandInSkynet(rejected={'G1'}), numpy.ones((16, len(TELESCOPES))))
+
+    assert run(workspace, stream=stream) == 1
+
+    store = ResultsStore(EVENT)
+    assert len(store.index.by_id) == 7
+    assert schedule.is_scheduled(store)
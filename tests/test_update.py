@@ -0,0 +1,109 @@
+import pytest
+
+from pysad.actions import schedule, update
+from pysad.utils import scoring
+from pysad.utils.galaxies import GalaxyDB
+from pysad.utils.results import ResultsStore, reconcile
+
+
+EVENT = 'S240101a'
+
+PROFILES = """
+[Default]
+probability = P_3D * P_LumW1
+
+[Penalized]
+probability = P_3D * P_LumW1
+penalty = -penalty(DistMpc)
+"""
+
+
+@pytest.fixture(autouse=True)
+def profiles(workspace, monkeypatch):
+    path = workspace / 'scoring.ini'
+    path.write_text(PROFILES)
+
+    monkeypatch.setattr(scoring, 'PROFILES_PATH', str(path))
+    monkeypatch.setattr(scoring, '_callables', {})
+
+
+def write_list(directory, revision: str, galaxies: list) -> str:
+    """ Writes a galaxy list as downloaded from NED. The file name is
+    the revision, like the content-addressed download cache.
+    """
+    path = directory / revision
+    path.write_text('name,ra,dec,P_3D,P_LumW1,DistMpc\n' + ''.join(
+        f'{name},{10. * i},{i - 45.},{p},1,{distance}\n' for i, (name, p, distance) in enumerate(galaxies)
+    ))
+
+    return str(path)
+
+
+def open_list(path: str, profile: str = None) -> GalaxyDB:
+    galaxy_db = GalaxyDB(EVENT, profile=profile)
+    galaxy_db.save_to_disk(path)
+
+    return galaxy_db
+
+
+def schedule_list(galaxy_db: GalaxyDB, limit: int) -> ResultsStore:
+    """ Records an observation of each desired galaxy like schedule. """
+    store = ResultsStore(EVENT)
+
+    for obs_id, galaxy in enumerate(galaxy_db.get(limit=limit)):
+        store.add({'id': obs_id, 'state': 'active', 'name': galaxy['name'], 'telescope': 'T1'})
+
+    schedule.record_serial(store, galaxy_db, limit)
+
+    return store
+
+
+def assert_same_plan(plan, expected):
+    assert sorted(plan.cancel_ids()) == sorted(expected.cancel_ids())
+    assert plan.add == expected.add
+
+
+@pytest.mark.parametrize('profile', [None, 'Default'])
+def test_delta_matches_full_reconcile(workspace, profile):
+    galaxies = [(f'G{i}', (10 - i) / 10, 100 * (10 - i)) for i in range(10)]
+
+    store = schedule_list(open_list(write_list(workspace, 'revision1', galaxies), profile), limit=6)
+
+    # G1 drops out, G10 enters at the top, and G7 moves into the desired galaxies
+    revised = [g for g in galaxies if g[0] != 'G1'] + [('G10', 1.5, 50.)]
+    revised[6] = ('G7', .95, 300.)
+
+    galaxy_db = open_list(write_list(workspace, 'revision2', revised), profile)
+    desired = galaxy_db.get(limit=5)
+
+    plan = update.get_plan(store, galaxy_db, desired)
+
+    assert galaxy_db.serial_number == 2
+    assert plan.keep is None
+    assert plan.cancel_ids()
+    assert_same_plan(plan, reconcile(store.index, desired))
+
+    store.close()
+
+
+def test_callable_profile_is_fully_reconciled(workspace):
+    weight = {'value': 0.}
+    scoring.register('penalty', lambda distance: weight['value'] * distance)
+
+    path = write_list(workspace, 'revision1', [(f'G{i}', (10 - i) / 10, 100 * (10 - i)) for i in range(10)])
+
+    store = schedule_list(open_list(path, 'Penalized'), limit=6)
+
+    # The penalty now outweighs the probability, so the nearest galaxies rank first
+    weight['value'] = .01
+
+    galaxy_db = open_list(path, 'Penalized')
+    desired = galaxy_db.get(limit=6)
+
+    plan = update.get_plan(store, galaxy_db, desired)
+
+    assert galaxy_db.serial_number == 1
+    assert len(plan.cancel_ids()) == 4
+    assert_same_plan(plan, reconcile(store.index, desired))
+
+    store.close()
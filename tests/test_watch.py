@@ -0,0 +1,53 @@
+import numpy
+import pytest
+
+from pysad.actions import schedule, watch
+from pysad.utils.galaxies import GalaxyDB
+from pysad.utils.results import ResultsStore
+
+
+EVENT = 'S240101a'
+
+
+@pytest.fixture
+def revision(workspace, monkeypatch):
+    """ Serves a local galaxy list as the latest revision of the event. """
+    path = workspace / 'revision1'
+    path.write_text('name,ra,dec,P_3D,P_LumW1\n' + ''.join(
+        f'G{i},{7.5 * i},{30. - i},{(8 - i) / 8},1\n' for i in range(8)
+    ))
+
+    monkeypatch.setattr(GalaxyDB, 'query', lambda self, serial='latest': str(path))
+
+    return str(path)
+
+
+def kwargs() -> dict:
+    return {'event': EVENT, 'obs_section': 'Default', 'exp_section': 'Default', 'tel_section': 'Default',
+            'telescopes': ['Morehead'], 'capacity': [4], 'plan': None, 'max_workers': 1}
+
+
+def test_poll_skips_a_revision_handled_by_another_run(revision, monkeypatch):
+    ids = iter(range(1, 100))
+    monkeypatch.setattr(schedule.api, 'add_observation', lambda **k: {'id': next(ids), 'name': k['name']})
+    monkeypatch.setattr(schedule.visibility, 'observable_hours', lambda ra, dec, *_: numpy.ones((len(ra), 1)))
+
+    # A manual schedule of the revision
+    galaxy_db = GalaxyDB(EVENT)
+    galaxy_db.save_to_disk(revision)
+    assert schedule.execute(**kwargs(), galaxy_db=galaxy_db) == 0
+
+    assert not watch.poll(ResultsStore(EVENT), **kwargs())
+
+
+def test_keeps_polling_after_any_error(workspace, monkeypatch):
+    polls = []
+
+    def poll(store, **_):
+        polls.append(store)
+        raise ValueError('Malformed galaxy list')
+
+    monkeypatch.setattr(watch, 'poll', poll)
+
+    assert watch.execute(**kwargs(), poll_seconds=0., max_polls=3) == 0
+    assert len(polls) == 3